@@ -0,0 +1,243 @@
+"""
+Benchmarks of the board and AI hot paths.
+
+Times board construction, nearby_mines, MinesweeperAI.add_knowledge
+and its infer/cross_check/endgame phases on the classic board sizes and on
+large synthetic boards, plus the per-move latency of add_knowledge
+against the move number. Results are written as JSON so that two
+revisions can be compared:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json
+    python benchmark.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from minesweeper import BitboardMinesweeper, Minesweeper, MinesweeperAI
+
+
+BOARDS = {
+    "beginner": (9, 9, 10),
+    "intermediate": (16, 16, 40),
+    "expert": (16, 30, 99),
+    "large": (100, 100, 1600),
+    "huge": (250, 250, 10000),
+}
+
+BACKENDS = {
+    "list": Minesweeper,
+    "bitboard": BitboardMinesweeper,
+}
+
+# Número de tramos de la curva de latencia por número de jugada
+SCALING_BINS = 20
+
+
+def summary(samples):
+    """
+    Returns count, total, mean and percentiles (seconds) of a list of timings.
+    """
+    if not samples:
+        return {"calls": 0, "total": 0.0, "mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    return {
+        "calls": len(ordered),
+        "total": sum(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        "max": ordered[-1],
+    }
+
+
+def timed(function, samples):
+    """
+    Wraps `function` so that the duration of every call is appended to `samples`.
+    """
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def bench_board(height, width, mines, repeat, backend=Minesweeper):
+    """
+    Times the construction of `repeat` boards and nearby_mines on every cell.
+    """
+    construction = []
+    for seed in range(repeat):
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        backend(height=height, width=width, mines=mines, rng=rng)
+        construction.append(time.perf_counter() - start)
+
+    game = backend(height=height, width=width, mines=mines, seed=0)
+    nearby = []
+    for i in range(height):
+        for j in range(width):
+            start = time.perf_counter()
+            game.nearby_mines((i, j))
+            nearby.append(time.perf_counter() - start)
+
+    return {"construction": summary(construction), "nearby_mines": summary(nearby)}
+
+
+def bench_ai(height, width, mines, games, backend=Minesweeper):
+    """
+    Plays `games` games with the AI and times add_knowledge, infer,
+    cross_check, the endgame reasoning and the move selection. Also returns the mean
+    add_knowledge latency against the move number, in `SCALING_BINS`
+    slices of the game.
+    """
+    timings = {name: [] for name in
+               ("add_knowledge", "infer", "cross_check", "endgame",
+                "make_safe_move", "make_guess_move")}
+    by_move = {}
+
+    for seed in range(games):
+        random.seed(f"ai:{seed}")
+        game = backend(height=height, width=width, mines=mines, seed=seed)
+        ai = MinesweeperAI(height=height, width=width, mines=mines)
+        # infer, cross_check y _endgame se llaman desde add_knowledge a través
+        # de la instancia
+        ai.infer = timed(ai.infer, timings["infer"])
+        ai.cross_check = timed(ai.cross_check, timings["cross_check"])
+        ai._endgame = timed(ai._endgame, timings["endgame"])
+        safe_move = timed(ai.make_safe_move, timings["make_safe_move"])
+        guess_move = timed(ai.make_guess_move, timings["make_guess_move"])
+
+        for number in range(height * width - mines):
+            move = safe_move()
+            if move is None:
+                move = guess_move()
+            if move is None or game.is_mine(move):
+                break
+            nearby = game.nearby_mines(move)
+            start = time.perf_counter()
+            ai.add_knowledge(move, nearby)
+            elapsed = time.perf_counter() - start
+            timings["add_knowledge"].append(elapsed)
+            by_move.setdefault(number, []).append(elapsed)
+
+    cells = height * width - mines
+    bins = {}
+    for number, samples in by_move.items():
+        bins.setdefault(number * SCALING_BINS // cells, []).extend(samples)
+    scaling = [
+        {"moves": [n * cells // SCALING_BINS, (n + 1) * cells // SCALING_BINS],
+         "mean": statistics.fmean(bins[n]), "samples": len(bins[n])}
+        for n in sorted(bins)
+    ]
+    return {name: summary(samples) for name, samples in timings.items()}, scaling
+
+
+def revision():
+    """
+    Returns the short git revision being benchmarked, if available.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(boards, games, repeat, backend="list"):
+    """
+    Runs every benchmark on the given boards and returns the results.
+    """
+    results = {
+        "meta": {
+            "revision": revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "games": games,
+            "backend": backend,
+        },
+        "boards": {},
+    }
+    for name in boards:
+        height, width, mines = BOARDS[name]
+        board = bench_board(height, width, mines, repeat, BACKENDS[backend])
+        ai, scaling = bench_ai(height, width, mines, games, BACKENDS[backend])
+        results["boards"][name] = {
+            "size": [height, width, mines],
+            "operations": {**board, **ai},
+            "scaling": scaling,
+        }
+        print(f"{name} ({height}x{width}, {mines} mines)")
+        for operation, stats in results["boards"][name]["operations"].items():
+            print(f"  {operation:16} {stats['calls']:8} calls  "
+                  f"mean {stats['mean'] * 1e6:10.1f}us  p99 {stats['p99'] * 1e6:10.1f}us")
+    return results
+
+
+def compare(before, after, threshold):
+    """
+    Prints the change in mean time of every operation between two
+    result files and returns the operations slower than `threshold`.
+    """
+    regressions = []
+    for name, board in after["boards"].items():
+        if name not in before["boards"]:
+            continue
+        print(name)
+        old = before["boards"][name]["operations"]
+        for operation, stats in board["operations"].items():
+            if operation not in old or not old[operation]["mean"]:
+                continue
+            ratio = stats["mean"] / old[operation]["mean"]
+            flag = ""
+            if ratio > threshold:
+                flag = "  REGRESSION"
+                regressions.append((name, operation, ratio))
+            print(f"  {operation:16} {old[operation]['mean'] * 1e6:10.1f}us -> "
+                  f"{stats['mean'] * 1e6:10.1f}us  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minesweeper benchmarks")
+    parser.add_argument("--boards", nargs="+", choices=sorted(BOARDS),
+                        default=["beginner", "intermediate", "expert", "large"])
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="list",
+                        help="board implementation")
+    parser.add_argument("--games", type=int, default=20, help="AI games per board")
+    parser.add_argument("--repeat", type=int, default=50, help="boards built per size")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=1.10,
+                        help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        regressions = compare(before, after, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    results = run(args.boards, args.games, args.repeat, args.backend)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
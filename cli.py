@@ -0,0 +1,158 @@
+"""
+Command-line Minesweeper, without pygame.
+
+Plays in the terminal, lets the AI play, or opens the pygame window
+(runner.py) only when asked for, so that scripts can call it in a loop
+without paying for pygame or needing a display:
+
+    python cli.py play --height 9 --width 9 --mines 10
+    python cli.py auto --seed 3
+    python cli.py gui
+"""
+import argparse
+import random
+import sys
+
+from minesweeper import MinesweeperAI, Session
+
+
+def show(session):
+    """
+    Prints what the player sees, in the same style as Minesweeper.print:
+    the number of nearby mines of every revealed cell, F for flags and
+    (once the game is lost) X for mines.
+    """
+    game = session.game
+    print("   " + " ".join(f"{j % 10}" for j in range(session.width)))
+    for i in range(session.height):
+        print("  " + "--" * session.width + "-")
+        row = []
+        for j in range(session.width):
+            cell = (i, j)
+            if session.lost and game.is_mine(cell):
+                row.append("X")
+            elif cell in session.flags:
+                row.append("F")
+            elif cell in session.revealed:
+                row.append(str(game.nearby_mines(cell)))
+            else:
+                row.append(" ")
+        print(f"{i % 10:2}|" + "|".join(row) + "|")
+    print("  " + "--" * session.width + "-")
+
+
+def play(args):
+    """
+    Interactive game: reads commands from standard input.
+    """
+    ai = MinesweeperAI(height=args.height, width=args.width, mines=args.mines)
+    session = Session(height=args.height, width=args.width, mines=args.mines, seed=args.seed)
+
+    print("Commands: 'i j' reveals a cell, 'f i j' toggles a flag, "
+          "'ai' lets the AI move, 'q' quits.")
+    while True:
+        if session.game is not None:
+            show(session)
+        state = session.state()
+        if state != "playing":
+            print(state.capitalize())
+            return 0 if state == "won" else 1
+        try:
+            words = input("> ").split()
+        except EOFError:
+            return 1
+        if not words:
+            continue
+        if words[0] == "q":
+            return 1
+
+        if words[0] == "ai":
+            move = ai.make_safe_move() or ai.make_guess_move()
+            if move is None:
+                session.flags = set(ai.mines)
+                print("No moves left to make.")
+                continue
+            print(f"AI plays {move[0]} {move[1]}")
+        else:
+            try:
+                numbers = [int(word) for word in words[words[0] == "f":]]
+                move = tuple(numbers)
+            except ValueError:
+                move = None
+            if move is None or len(move) != 2 or not (
+                    0 <= move[0] < args.height and 0 <= move[1] < args.width):
+                print("Unknown command.")
+                continue
+            if move in session.revealed:
+                print("Cell already revealed.")
+                continue
+            if words[0] == "f":
+                session.flag(move)
+                continue
+            if move in session.flags:
+                print("Cell is flagged.")
+                continue
+
+        ai.add_knowledge_batch(session.reveal(move))
+
+
+def auto(args):
+    """
+    The AI plays one game on its own, printing its moves.
+    """
+    if args.seed is not None:
+        # Como en simulate.py: la semilla fija el tablero y las jugadas al azar
+        random.seed(f"ai:{args.seed}")
+    ai = MinesweeperAI(height=args.height, width=args.width, mines=args.mines)
+    session = Session(height=args.height, width=args.width, mines=args.mines, seed=args.seed)
+
+    move = ai.make_guess_move()
+    while move is not None and session.state() == "playing":
+        if not args.quiet:
+            print(f"AI plays {move[0]} {move[1]}")
+        ai.add_knowledge_batch(session.reveal(move))
+        if session.state() == "playing":
+            move = ai.make_safe_move() or ai.make_guess_move()
+    if move is None:
+        # El AI conoce todas las minas: las marca
+        session.flags = set(ai.mines)
+
+    won = session.state() == "won"
+    if not args.quiet:
+        session.game.print()
+    print("Won" if won else "Lost", len(ai.moves_made), "cells revealed")
+    return 0 if won else 1
+
+
+def gui(args):
+    """
+    Opens the pygame window. runner.py runs when imported.
+    """
+    import runner  # noqa: F401
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minesweeper in the terminal")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, function, text in (
+        ("play", play, "play in the terminal"),
+        ("auto", auto, "let the AI play one game"),
+        ("gui", gui, "open the pygame window"),
+    ):
+        command = commands.add_parser(name, help=text)
+        command.set_defaults(function=function)
+        if name != "gui":
+            command.add_argument("--height", type=int, default=8)
+            command.add_argument("--width", type=int, default=8)
+            command.add_argument("--mines", type=int, default=8)
+            command.add_argument("--seed", type=int, default=None)
+        if name == "auto":
+            command.add_argument("--quiet", action="store_true",
+                                 help="only print the result")
+
+    args = parser.parse_args()
+    sys.exit(args.function(args))
+
+
+if __name__ == "__main__":
+    main()
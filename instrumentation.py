@@ -0,0 +1,102 @@
+"""
+Opt-in instrumentation of the Minesweeper AI.
+
+An `Instrumentation` object keeps counters of what the inference engine
+does and the time spent in each phase of add_knowledge. It can also
+forward one event (a plain dict) per deduction and per knowledge update
+to a sink: any callable, such as the `MemorySink`, `LoggingSink` and
+`JsonLinesSink` below. An AI created without instrumentation does not
+pay for any of this.
+"""
+import json
+import logging
+
+
+class Instrumentation:
+    """
+    Counters and phase timings of a MinesweeperAI.
+    """
+
+    COUNTERS = (
+        "sentences_created",
+        "sentences_deduplicated",
+        "sentences_emptied",
+        "subset_inferences",
+        "linear_eliminations",
+        "safes_derived",
+        "mines_derived",
+        "sentences_compacted",
+        "sentences_evicted",
+    )
+    # cross_check incluye la eliminación lineal cuando inference="linear";
+    # endgame es el razonamiento con el número total de minas
+    PHASES = ("mark", "infer", "cross_check", "endgame")
+
+    def __init__(self, sink=None):
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.timings = dict.fromkeys(self.PHASES, 0.0)
+        self.updates = 0
+        self.sink = sink
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def event(self, kind, **fields):
+        """
+        Sends an event to the sink, if there is one.
+        """
+        if self.sink is not None:
+            self.sink({"event": kind, **fields})
+
+    def snapshot(self):
+        """
+        Returns the current counters and timings as a dict.
+        """
+        return {
+            "updates": self.updates,
+            "counters": dict(self.counters),
+            "timings": dict(self.timings),
+        }
+
+
+class MemorySink:
+    """
+    Keeps every event in the `events` list.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+
+class LoggingSink:
+    """
+    Writes every event to a logger (the "minesweeper" logger by default).
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger("minesweeper")
+        self.level = level
+
+    def __call__(self, event):
+        self.logger.log(self.level, "%s", event)
+
+
+class JsonLinesSink:
+    """
+    Writes every event as one line of JSON to a file (a path or an open
+    file). Cells are written as [i, j] lists.
+    """
+
+    def __init__(self, file):
+        if isinstance(file, str):
+            file = open(file, "a")
+        self.file = file
+
+    def __call__(self, event):
+        self.file.write(json.dumps(event, default=list) + "\n")
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,136 @@
+"""
+Load generator for server.py: opens many sessions at once, each one a
+bot that plays games by asking the server's AI for every move, and
+reports the requests per second and the latency of the requests.
+
+    python loadtest.py --spawn --sessions 2000 --seconds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from server import raise_file_limit
+from simulate import latency_bucket, percentile
+
+
+async def bot(host, port, args, deadline, stats):
+    """
+    Plays games on one connection until the deadline, recording the
+    latency of every request.
+    """
+    # La respuesta a un reveal de un tablero grande ocupa una línea de varios MB
+    reader, writer = await asyncio.open_connection(host, port, limit=2 ** 24)
+
+    async def request(line):
+        start = time.perf_counter_ns()
+        writer.write(line.encode() + b"\n")
+        response = json.loads(await reader.readline())
+        bucket = latency_bucket(time.perf_counter_ns() - start)
+        stats["latencies"][bucket] = stats["latencies"].get(bucket, 0) + 1
+        stats["requests"] += 1
+        if not response["ok"]:
+            stats["errors"] += 1
+        return response
+
+    try:
+        while time.monotonic() < deadline:
+            game = (await request(f"new {args.height} {args.width} {args.mines}"))["game"]
+            state = "playing"
+            while state == "playing" and time.monotonic() < deadline:
+                answer = await request(f"ai {game}")
+                move = answer["move"]
+                if move is None:
+                    # El AI conoce todas las minas: se marcan, como en runner.py
+                    for i, j in answer["mines"]:
+                        state = (await request(f"flag {game} {i} {j}"))["state"]
+                    break
+                state = (await request(f"reveal {game} {move[0]} {move[1]}"))["state"]
+            await request(f"close {game}")
+            stats["games"] += 1
+            stats["won"] += state == "won"
+    finally:
+        writer.close()
+
+
+async def run(args):
+    raise_file_limit()
+    server = None
+    if args.spawn:
+        # El servidor va en otro proceso para no competir por el mismo bucle
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+             "--host", args.host, "--port", str(args.port)],
+            stdout=subprocess.PIPE, text=True
+        )
+        server.stdout.readline()
+
+    stats = {"requests": 0, "errors": 0, "games": 0, "won": 0, "latencies": {}}
+    try:
+        start = time.perf_counter()
+        deadline = time.monotonic() + args.seconds
+        results = await asyncio.gather(*(
+            bot(args.host, args.port, args, deadline, stats)
+            for _ in range(args.sessions)
+        ), return_exceptions=True)
+        seconds = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    failed = [r for r in results if isinstance(r, Exception)]
+    histogram = stats["latencies"]
+    return {
+        "sessions": args.sessions,
+        "failed_sessions": len(failed),
+        "seconds": seconds,
+        "requests": stats["requests"],
+        "errors": stats["errors"],
+        "requests_per_second": stats["requests"] / seconds,
+        "games": stats["games"],
+        "won": stats["won"],
+        "latency": {
+            "p50": percentile(histogram, 0.50),
+            "p90": percentile(histogram, 0.90),
+            "p99": percentile(histogram, 0.99),
+            "p999": percentile(histogram, 0.999),
+            "max": percentile(histogram, 1.0),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the Minesweeper server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--spawn", action="store_true",
+                        help="start a server.py process for the test")
+    parser.add_argument("--sessions", type=int, default=1000,
+                        help="simultaneous sessions (one connection each)")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=8)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    latency = result["latency"]
+    print(f"Sessions: {result['sessions']} ({result['failed_sessions']} failed)  "
+          f"games: {result['games']}  won: {result['won']}")
+    print(f"Requests: {result['requests']} ({result['errors']} errors)  "
+          f"{result['requests_per_second']:.1f} requests/s")
+    print("latency: " + "  ".join(f"{k} {latency[k] * 1e3:.2f}ms"
+                                  for k in ("p50", "p90", "p99", "p999", "max")))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,101 @@
+import heapq
 import itertools
 import random
-from itertools import product
+import time
+from array import array
+from bisect import bisect_right
+from collections import Counter, deque
+from collections.abc import MutableSet
+from contextlib import contextmanager
+from operator import add, sub
+
+import solver
+
+# NumPy es opcional: solo acelera el conteo de vecinos de los tableros
+# grandes, y se importa la primera vez que hace falta para que importar
+# este módulo sea inmediato
+NUMPY_MIN_CELLS = 10000
+_np = False
+
+
+def _numpy():
+    """
+    Returns the numpy module, or None if it is not installed.
+    """
+    global _np
+    if _np is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _np = numpy
+    return _np
+
+
+def place_mines(height, width, mines, rng=None, safe=None):
+    """
+    Chooses the mine cells of a board in a single pass, as a list of
+    flat indices (i * width + j), without rejection sampling.
+
+    `rng` is a random.Random instance (the global `random` module by
+    default). If `safe` is given, that cell and its neighbours are kept
+    free of mines; when the board is too full for that, only the cell
+    itself is kept free.
+    """
+    rng = rng or random
+    cells = height * width
+    excluded = []
+    if safe is not None:
+        si, sj = safe
+        excluded = [
+            i * width + j
+            for i in range(max(si - 1, 0), min(si + 2, height))
+            for j in range(max(sj - 1, 0), min(sj + 2, width))
+        ]
+        if mines > cells - len(excluded):
+            excluded = [si * width + sj]
+    if not 0 <= mines <= cells - len(excluded):
+        raise ValueError(f"cannot place {mines} mines on a {height}x{width} board")
+
+    chosen = rng.sample(range(cells - len(excluded)), mines)
+    if excluded:
+        # Se salta por encima de las celdas excluidas: el índice k-ésimo
+        # libre es k más el número de excluidas que quedan antes
+        gaps = [e - n for n, e in enumerate(sorted(excluded))]
+        chosen = [index + bisect_right(gaps, index) for index in chosen]
+    return chosen
+
+
+def neighbours(cell, height, width):
+    """
+    Returns the cells around a cell of a height x width board, as a
+    tuple. Nothing is stored per cell: the 8 neighbours of an inner cell
+    come from fixed offsets, and only the cells on the border go through
+    the bounds checks.
+    """
+    i, j = cell
+    if 0 < i < height - 1 and 0 < j < width - 1:
+        return ((i - 1, j - 1), (i - 1, j), (i - 1, j + 1), (i, j - 1),
+                (i, j + 1), (i + 1, j - 1), (i + 1, j), (i + 1, j + 1))
+    # Celda del borde: se recortan los vecinos fuera del tablero
+    return tuple(
+        (ni, nj)
+        for ni in range(max(i - 1, 0), min(i + 2, height))
+        for nj in range(max(j - 1, 0), min(j + 2, width))
+        if ni != i or nj != j
+    )
 
 
 class Minesweeper:
     """
     Minesweeper game representation
+
+    The mines are placed with `place_mines`: pass `seed` or `rng` (a
+    random.Random) for a reproducible board, and `safe` to keep the
+    first click and its neighbours free of mines.
     """
 
-    def __init__(self, height=8, width=8, mines=8):
+    def __init__(self, height=8, width=8, mines=8, seed=None, rng=None, safe=None):
 
         # Set initial width, height, and number of mines
         self.height = height
@@ -17,24 +104,25 @@ class Minesweeper:
 
         # Initialize an empty field with no mines
         # Inicializa todo el tablero con sus respectivos espacios vacios
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.board = [[False] * width for _ in range(height)]
 
         # Añaden las minas randomicamente en cada uno de los espacios en blanco
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        if rng is None and seed is not None:
+            rng = random.Random(seed)
+        for index in place_mines(height, width, mines, rng, safe):
+            i, j = divmod(index, width)
+            self.mines.add((i, j))
+            self.board[i][j] = True
+
+        # Conteo de minas vecinas de cada celda, calculado una sola vez
+        self.counts = self._count_nearby()
 
         # At first, player has found no mines
         self.mines_found = set()
 
+        # Celdas ya descubiertas por reveal()
+        self.revealed = set()
+
     # Función que permite imprimir la representación del tablero
     def print(self):
         """
@@ -64,27 +152,94 @@ class Minesweeper:
         within one row and column of a given cell,
         not including the cell itself.
         """
+        # El conteo se calcula una sola vez al generar el tablero
+        i, j = cell
+        return self.counts[i][j]
 
-        # Keep count of nearby mines
-        count = 0
+    def nearby_mines_many(self, cells):
+        """
+        Returns the list of nearby mine counts of many cells at once.
+        """
+        counts = self.counts
+        return [counts[i][j] for i, j in cells]
 
-        # Loop over all cells within one row and column
-        # Recorrer todas las celdas referente a una fila o columna
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
+    def reveal(self, cell):
+        """
+        Reveals a safe cell. If it has no nearby mines, its neighbours
+        are revealed as well, and so on (breadth-first, without
+        recursion). Returns a dict {cell: nearby mines} with every
+        newly revealed cell.
+        """
+        revealed = {}
+        if cell in self.revealed:
+            return revealed
+        self.revealed.add(cell)
+        queue = deque([cell])
+        while queue:
+            i, j = queue.popleft()
+            count = self.counts[i][j]
+            revealed[(i, j)] = count
+            if count:
+                continue
+            # Una celda con 0 minas vecinas descubre a todos sus vecinos
+            for ni in range(max(i - 1, 0), min(i + 2, self.height)):
+                for nj in range(max(j - 1, 0), min(j + 2, self.width)):
+                    if (ni, nj) not in self.revealed:
+                        self.revealed.add((ni, nj))
+                        queue.append((ni, nj))
+        return revealed
 
-                # Ignore the cell itself
-                # Ignora a la propia celda
-                if (i, j) == cell:
-                    continue
+    def is_revealed(self, cell):
+        return cell in self.revealed
+
+    def flag(self, cell):
+        """
+        Toggles the flag of a cell.
+        """
+        if cell in self.mines_found:
+            self.mines_found.remove(cell)
+        else:
+            self.mines_found.add(cell)
+
+    def is_flagged(self, cell):
+        return cell in self.mines_found
 
-                # Update count if cell in bounds and is mine
-                # Realizar el conteo de la celda, para ver si es mia o esta dentro de los limites
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
+    def _count_nearby(self):
+        """
+        Computes the number of nearby mines of every cell of the board,
+        as a list of rows. Uses a NumPy 2-D convolution on boards of at
+        least NUMPY_MIN_CELLS cells when NumPy is installed, and
+        otherwise the same separable sum row by row (horizontal sums of
+        3, then vertical sums of 3 of those).
+        """
+        np = _numpy() if self.height * self.width >= NUMPY_MIN_CELLS else None
+        if np is not None:
+            # Suma de las 8 copias desplazadas del tablero (convolución 3x3)
+            padded = np.zeros((self.height + 2, self.width + 2), dtype=np.uint8)
+            padded[1:-1, 1:-1] = self.board
+            counts = np.zeros((self.height, self.width), dtype=np.uint8)
+            for di in range(3):
+                for dj in range(3):
+                    if di != 1 or dj != 1:
+                        counts += padded[di:di + self.height, dj:dj + self.width]
+            return counts.tolist()
 
-        return count
+        horizontal = []
+        for row in self.board:
+            padded = [0] + row + [0]
+            horizontal.append(list(map(
+                add, map(add, padded[:-2], padded[1:-1]), padded[2:]
+            )))
+        zeros = [0] * self.width
+        counts = []
+        for i, row in enumerate(self.board):
+            above = horizontal[i - 1] if i > 0 else zeros
+            below = horizontal[i + 1] if i + 1 < self.height else zeros
+            # La propia mina no cuenta como vecina
+            counts.append(list(map(
+                sub, map(add, map(add, above, horizontal[i]), below), row
+            )))
+        return counts
 
     def won(self):
         """
@@ -96,33 +251,298 @@ class Minesweeper:
         return self.mines_found == self.mines
 
 
+class BitboardMinesweeper:
+    """
+    Minesweeper game representation backed by packed byte lanes.
+
+    Every cell is one byte of a `bytearray` holding bit flags (mine,
+    revealed, flagged). The rows are laid out with a stride of
+    width + 1 and a padding row above and below, so that the empty
+    padding column separates consecutive rows and every neighbour of a
+    real cell is a valid lane.
+
+    The neighbour counts are computed once for the whole board: the mine
+    lanes are read as one big integer, the 8 shifted copies (one per
+    neighbour direction) are added together, and each byte of the sum
+    is the count of one cell (it is at most 8, so lanes never carry).
+
+    It offers the same is_mine/nearby_mines/reveal/flag/won API as
+    Minesweeper, and places the mines the same way (same `seed`, same
+    board).
+    """
+
+    MINE = 1
+    REVEALED = 2
+    FLAGGED = 4
+
+    def __init__(self, height=8, width=8, mines=8, seed=None, rng=None, safe=None):
+
+        self.height = height
+        self.width = width
+        self.mine_count = mines
+        self.stride = width + 1
+        lanes = (height + 2) * self.stride
+        self.state = bytearray(lanes)
+
+        if rng is None and seed is not None:
+            rng = random.Random(seed)
+        for index in place_mines(height, width, mines, rng, safe):
+            i, j = divmod(index, width)
+            self.state[(i + 1) * self.stride + j] = self.MINE
+
+        # Conteo de vecinos: suma de las 8 copias desplazadas del tablero
+        board = int.from_bytes(self.state, "little")
+        total = 0
+        for offset in (1, self.stride - 1, self.stride, self.stride + 1):
+            total += board >> (8 * offset)
+            total += board << (8 * offset)
+        self.counts = total.to_bytes(lanes + 2 * self.stride, "little")[:lanes]
+
+        # Contadores para comprobar la victoria en tiempo constante
+        self.flagged = 0
+        self.flagged_mines = 0
+        self.revealed_count = 0
+
+    def lane(self, cell):
+        """
+        Returns the index of the byte of a cell.
+        """
+        i, j = cell
+        return (i + 1) * self.stride + j
+
+    @property
+    def mines(self):
+        """
+        Set of mine cells, built on demand (as in Minesweeper.mines).
+        """
+        return {
+            (i, j)
+            for i in range(self.height)
+            for j in range(self.width)
+            if self.state[(i + 1) * self.stride + j] & self.MINE
+        }
+
+    @property
+    def mines_found(self):
+        """
+        Frozen set of the flagged cells, built on demand: it is a
+        snapshot, so flags are changed with flag(), never through it.
+        """
+        return frozenset({
+            (i, j)
+            for i in range(self.height)
+            for j in range(self.width)
+            if self.state[(i + 1) * self.stride + j] & self.FLAGGED
+        })
+
+    def print(self):
+        """
+        Prints a text-based representation
+        of where mines are located.
+        """
+        for i in range(self.height):
+            print("--" * self.width + "-")
+            row = (i + 1) * self.stride
+            for j in range(self.width):
+                if self.state[row + j] & self.MINE:
+                    print("|X", end="")
+                else:
+                    print("| ", end="")
+            print("|")
+        print("--" * self.width + "-")
+
+    def is_mine(self, cell):
+        i, j = cell
+        return self.state[(i + 1) * self.stride + j] & self.MINE != 0
+
+    def nearby_mines(self, cell):
+        """
+        Returns the number of mines that are
+        within one row and column of a given cell,
+        not including the cell itself.
+        """
+        i, j = cell
+        return self.counts[(i + 1) * self.stride + j]
+
+    def nearby_mines_many(self, cells):
+        """
+        Returns the list of nearby mine counts of many cells at once.
+        """
+        counts, stride = self.counts, self.stride
+        return [counts[(i + 1) * stride + j] for i, j in cells]
+
+    def reveal(self, cell):
+        """
+        Reveals a safe cell, and its neighbours while they have no
+        nearby mines (see Minesweeper.reveal). Returns a dict
+        {cell: nearby mines} with every newly revealed cell.
+        """
+        revealed = {}
+        state, counts, stride = self.state, self.counts, self.stride
+        lane = self.lane(cell)
+        if state[lane] & self.REVEALED:
+            return revealed
+        state[lane] |= self.REVEALED
+        queue = deque([lane])
+        offsets = (-stride - 1, -stride, -stride + 1, -1, 1,
+                   stride - 1, stride, stride + 1)
+        lanes = len(state)
+        while queue:
+            lane = queue.popleft()
+            i, j = divmod(lane, stride)
+            revealed[(i - 1, j)] = counts[lane]
+            if counts[lane]:
+                continue
+            for offset in offsets:
+                other = lane + offset
+                # Se saltan las filas y la columna de relleno
+                if (not state[other] & self.REVEALED
+                        and other % stride != self.width
+                        and stride <= other < lanes - stride):
+                    state[other] |= self.REVEALED
+                    queue.append(other)
+        self.revealed_count += len(revealed)
+        return revealed
+
+    def is_revealed(self, cell):
+        return self.state[self.lane(cell)] & self.REVEALED != 0
+
+    def flag(self, cell):
+        """
+        Toggles the flag of a cell.
+        """
+        lane = self.lane(cell)
+        self.state[lane] ^= self.FLAGGED
+        change = 1 if self.state[lane] & self.FLAGGED else -1
+        self.flagged += change
+        if self.state[lane] & self.MINE:
+            self.flagged_mines += change
+
+    def is_flagged(self, cell):
+        return self.state[self.lane(cell)] & self.FLAGGED != 0
+
+    def won(self):
+        """
+        Checks if all mines have been flagged.
+        """
+        return self.flagged == self.flagged_mines == self.mine_count
+
+
+class InvalidMove(Exception):
+    """
+    Raised by Session for a move that the rules of the game do not allow.
+    """
+
+
+class Session:
+    """
+    One game as the player sees it: the board, the revealed and flagged
+    cells, and whether a mine was hit. The terminal (cli.py), the window
+    (runner.py) and the server (server.py) all play through it, so they
+    follow the same rules:
+
+    - the board is placed at the first reveal, keeping that cell and its
+      neighbours free of mines (`seed` makes it reproducible);
+    - revealing a cell with no nearby mines reveals its whole zone, and
+      revealed cells lose their flags;
+    - the game is won when every safe cell is revealed or when the
+      flags are exactly the mines, and lost when a mine is revealed.
+    """
+
+    def __init__(self, height=8, width=8, mines=8, seed=None):
+        self.height = height
+        self.width = width
+        self.mines = mines
+        self.seed = seed
+        self.game = None
+        self.revealed = set()
+        self.flags = set()
+        self.lost = False
+
+    def state(self):
+        """
+        Returns "playing", "won" or "lost".
+        """
+        if self.lost:
+            return "lost"
+        if len(self.revealed) == self.height * self.width - self.mines:
+            return "won"
+        if self.game is not None and self.flags == self.game.mines:
+            return "won"
+        return "playing"
+
+    def reveal(self, cell):
+        """
+        Reveals a cell and returns a dict {cell: nearby mines} with every
+        newly revealed cell (empty if the cell is a mine, which loses the
+        game). Raises InvalidMove once the game is over.
+        """
+        if self.state() != "playing":
+            raise InvalidMove("game over")
+        if self.game is None:
+            # El primer clic nunca es una mina: el tablero se genera alrededor de él
+            self.game = Minesweeper(height=self.height, width=self.width,
+                                    mines=self.mines, seed=self.seed, safe=cell)
+        if self.game.is_mine(cell):
+            self.lost = True
+            return {}
+        revealed = self.game.reveal(cell)
+        self.revealed.update(revealed)
+        self.flags.difference_update(revealed)
+        return revealed
+
+    def flag(self, cell):
+        """
+        Toggles the flag of an unrevealed cell and returns whether it is
+        flagged now. Raises InvalidMove once the game is over or if the
+        cell is revealed.
+        """
+        if self.state() != "playing":
+            raise InvalidMove("game over")
+        if cell in self.revealed:
+            raise InvalidMove("cell already revealed")
+        if cell in self.flags:
+            self.flags.remove(cell)
+            return False
+        self.flags.add(cell)
+        return True
+
+
 class Sentence:
     """
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    Sentences are immutable and hashable by (cells, count): marking a
+    cell returns a new sentence instead of modifying this one, so they
+    can be stored in sets and deduplicated in constant time.
     """
     """
     Incorporación de las sentencias dentro de la base del conocimiento
     """
-    _no = 0
+    __slots__ = ("cells", "count")
 
     def __init__(self, cells, count):
-        self.cells = set(cells) # Se incorpora dentro de un conjunto
+        self.cells = frozenset(cells) # Se incorpora dentro de un conjunto inmutable
         self.count = count
-        self.no = Sentence._no # Incorporar una nueva sentencia
-        Sentence._no += 1 # Aumenta el contador del número de sentencias
     # Es un método que permite comprar si una de listas del conjunto de listas es
     # igual a otra y adicionalmente observar si cuentan con el mismo número de elementos
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
-    # Permite preparar la salida, para de esta forma imprimir el número de elementos
-    # creados por parte de la instancia Sentences junto con las casillas correspondientes a esos valores
+        if not isinstance(other, Sentence):
+            return NotImplemented
+        return self.count == other.count and self.cells == other.cells
+
+    # El hash usa los mismos campos que __eq__ (frozenset guarda su propio hash)
+    def __hash__(self):
+        return hash((self.cells, self.count))
+    # Permite preparar la salida, para de esta forma imprimir las casillas
+    # de la sentencia junto con el número de minas entre ellas
     def __str__(self):
-        return f"n.{self.no}: {self.cells} = {self.count}"
+        return f"{sorted(self.cells)} = {self.count}"
     # Imprime lo mencionado a la salida de __str__
     def __repr__(self):
-        return f"n.{self.no}: {self.cells} = {self.count}"
+        return f"Sentence({sorted(self.cells)}, {self.count})"
 
     def known_mines(self):
         """
@@ -133,7 +553,7 @@ class Sentence:
         if len(self.cells) == self.count:
             return self.cells
         else:
-            return set()
+            return frozenset()
         # raise NotImplementedError
 
     def known_safes(self):
@@ -146,37 +566,116 @@ class Sentence:
         """
         # raise NotImplementedError
         if self.count == 0:
-            if len(self.cells) != 0:
-                print(f"{self} => Seguro: {self.cells}")
             return self.cells
         else:
-            return set()
+            return frozenset()
 
     def mark_mine(self, cell):
         """
-        Updates internal knowledge representation given the fact that
-        a cell is known to be a mine.
+        Returns the sentence that results from knowing that
+        a cell is a mine (the sentence itself if it does not
+        contain the cell).
         """
         # Es una fusión que permite alterar la base de conocimientos sobre aquellas celdas que son
         # conocidas, para que estas influyan en el funcionamiento del calculo de
         # las minas alrededor de un vecino
         if cell not in self.cells:
-            return
+            return self
 
-        self.cells.remove(cell)
-        self.count -= 1
+        return Sentence(self.cells - {cell}, self.count - 1)
 
     def mark_safe(self, cell):
         """
-        Updates internal knowledge representation given the fact that
-        a cell is known to be safe.
+        Returns the sentence that results from knowing that
+        a cell is safe (the sentence itself if it does not
+        contain the cell).
         """
         # o	Actualizar la base de conocimiento sobre aquellas celdas en las que se ha calculado que
         # han sido seguras según la función de marcado de celdas segura
         if cell not in self.cells:
-            return
+            return self
+
+        return Sentence(self.cells - {cell}, self.count)
+
+
+# Tamaño mínimo de la base de conocimiento antes de compactarla automáticamente
+COMPACT_MIN = 256
 
-        self.cells.remove(cell)
+# Celdas desconocidas a partir de las cuales se usa el número total de minas
+ENDGAME_CELLS = 64
+
+
+class CellState:
+    """
+    What the AI knows about every cell of a board, in one byte per cell
+    of a `bytearray` indexed by i * width + j. Each byte holds bit flags
+    (safe, mine, played), and the `safes`, `mines` and `moves_made`
+    attributes are set-like views of one flag each, so code written
+    for sets of (i, j) cells keeps working.
+    """
+
+    SAFE = 1
+    MINE = 2
+    PLAYED = 4
+
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.state = bytearray(height * width)
+        self.safes = CellSet(self, self.SAFE)
+        self.mines = CellSet(self, self.MINE)
+        self.moves_made = CellSet(self, self.PLAYED)
+
+
+class CellSet(MutableSet):
+    """
+    Set of the cells of a CellState that have a given flag. Membership,
+    add and discard take constant time, and so does len() (the set
+    keeps its own count); iterating scans the whole board.
+    """
+
+    def __init__(self, cells, flag):
+        self.cells = cells
+        self.flag = flag
+        self.count = 0
+
+    def __contains__(self, cell):
+        i, j = cell
+        cells = self.cells
+        return (0 <= i < cells.height and 0 <= j < cells.width
+                and cells.state[i * cells.width + j] & self.flag != 0)
+
+    def __iter__(self):
+        flag, width = self.flag, self.cells.width
+        for index, value in enumerate(self.cells.state):
+            if value & flag:
+                yield divmod(index, width)
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"CellSet({sorted(self)})"
+
+    def add(self, cell):
+        i, j = cell
+        index = i * self.cells.width + j
+        state = self.cells.state
+        if not state[index] & self.flag:
+            state[index] |= self.flag
+            self.count += 1
+
+    def discard(self, cell):
+        if cell in self:
+            i, j = cell
+            self.cells.state[i * self.cells.width + j] &= ~self.flag
+            self.count -= 1
+
+    def copy(self):
+        """
+        Returns the cells as a plain set.
+        """
+        return set(self)
 
 
 class MinesweeperAI:
@@ -184,15 +683,214 @@ class MinesweeperAI:
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=8, probability="auto",
+                 safe_order="fifo", instrumentation=None, max_knowledge=None,
+                 inference="subset", pool=None, workers=1):
 
         # Set initial height and width
         self.height = height
         self.width = width
-        self.moves_made = set()
-        self.mines = set()
-        self.safes = set()
-        self.knowledge = []
+        # Número total de minas del tablero (lo usa el cálculo de probabilidades)
+        self.total_mines = mines
+
+        # Pool de movimientos al azar: índices (i * width + j) de las celdas
+        # sin jugar que no son minas conocidas, y la posición de cada una en
+        # el pool (-1 si ya salió), para borrar en tiempo constante. Con 4
+        # bytes por entrada, junto con CellState son 9 bytes por celda: un
+        # AI nuevo de 1000x1000 ocupa unos 9 MB
+        self._pool = array("i", range(height * width))
+        self._pool_slot = array("i", range(height * width))
+
+        # Celdas seguras aún sin jugar. Con safe_order="fifo" salen en el
+        # orden en que se descubrieron; con "information" primero las que
+        # tienen más vecinos desconocidos (las que más pueden revelar)
+        self.safe_order = safe_order
+        self._safe_queue = [] if safe_order == "information" else deque()
+
+        # Cálculo de probabilidades para adivinar: "exact" (enumeración),
+        # "sample" (muestreo aproximado) o "auto" (exacto, y muestreo solo
+        # en las componentes demasiado grandes); y el presupuesto del muestreo
+        self.probability = probability
+        self.sample_steps = solver.SAMPLE_STEPS
+        self.sample_time = None
+
+        # Pool de procesos opcional (multiprocessing.Pool o
+        # ProcessPoolExecutor) de `workers` procesos para resolver en
+        # paralelo las componentes grandes de la frontera al calcular
+        # probabilidades y en el final de partida; la inferencia de cada
+        # actualización (cross_check, eliminate) sigue en este proceso
+        self.pool = pool
+        self.workers = workers
+
+        # Motor de inferencia entre sentencias: "subset" (regla del
+        # subconjunto entre pares) o "linear" (eliminación gaussiana)
+        self.inference = inference
+
+        # Contadores y tiempos opcionales (ver instrumentation.py); None = desactivado
+        self.instrumentation = instrumentation
+
+        # Estado de cada celda en un byte: moves_made, mines y safes son
+        # vistas con la misma interfaz que un set de celdas
+        self.cells = CellState(height, width)
+        self.moves_made = self.cells.moves_made
+        self.mines = self.cells.mines
+        self.safes = self.cells.safes
+        self.knowledge = set()
+
+        # Índice celda -> sentencias que la contienen, para que marcar
+        # una celda solo visite las sentencias afectadas
+        self.index = {}
+
+        # Sentencias pendientes de revisar (worklist): `_dirty` espera a
+        # infer() y `_to_check` espera a cross_check()
+        self._dirty = deque()
+        self._to_check = set()
+
+        # Sentencias deducidas (no observadas en el tablero), de la más
+        # antigua a la más reciente: son las únicas que se pueden desalojar
+        # cuando la base de conocimiento supera `max_knowledge`
+        self.max_knowledge = max_knowledge
+        self._derived = {}
+
+        # Celdas de sentencias deducidas que se desalojaron o compactaron:
+        # cuando una sentencia revisada toca alguna, las sentencias de esas
+        # celdas se revisan de nuevo para volver a deducir lo olvidado
+        self._forgotten = set()
+
+        # Tamaño de la base de conocimiento a partir del cual se compacta
+        self._compact_at = COMPACT_MIN
+
+        # Final de partida: con `endgame_cells` celdas desconocidas o menos,
+        # el número de minas restantes se añade como una sentencia más
+        self.endgame_cells = ENDGAME_CELLS
+        self._endgame_key = None
+
+        # Registro de deshacer (trail): lista de (función, argumentos) que
+        # revierten cada cambio mientras quede algún checkpoint sin liberar
+        # (None = sin registro), y las marcas de esos checkpoints, en orden.
+        # Las entradas del heap de seguras que restore() debe quitar se
+        # juntan en `_unpushed` para reconstruirlo una sola vez
+        self._trail = None
+        self._checkpoints = []
+        self._unpushed = []
+
+    def _add_sentence(self, sentence, derived=False):
+        """
+        Adds a sentence to the knowledge base and to the
+        cell -> sentences index, and queues it for inference.
+        Empty and already known sentences are ignored.
+
+        `derived` tells whether the sentence was inferred from others
+        rather than observed on the board.
+        """
+        if not sentence.cells:
+            return
+        if sentence in self.knowledge:
+            if self.instrumentation is not None:
+                self.instrumentation.count("sentences_deduplicated")
+            if not derived:
+                # Si además se observó, ya no se puede desalojar
+                self._promote(sentence)
+            return
+        if self.instrumentation is not None:
+            self.instrumentation.count("sentences_created")
+        self._insert(sentence, derived)
+        if self._trail is not None:
+            self._trail.append((self._delete, sentence))
+        self._dirty.append(sentence)
+
+    def _insert(self, sentence, derived):
+        self.knowledge.add(sentence)
+        for cell in sentence.cells:
+            self.index.setdefault(cell, set()).add(sentence)
+        if derived:
+            self._derived[sentence] = None
+
+    def _promote(self, sentence):
+        """
+        Turns a derived sentence into an observed one.
+        """
+        if sentence in self._derived:
+            del self._derived[sentence]
+            if self._trail is not None:
+                self._trail.append((self._derived.__setitem__, sentence, None))
+
+    def _evict(self):
+        """
+        Removes the oldest derived sentences while the knowledge base
+        is bigger than `max_knowledge`. Observed sentences are never
+        evicted, so the cap can be exceeded when they alone exceed it.
+        Called once the inference of an update is over, so that an
+        evicted sentence cannot be derived again in the same update.
+        """
+        while len(self.knowledge) > self.max_knowledge and self._derived:
+            self._forget(next(iter(self._derived)))
+            if self.instrumentation is not None:
+                self.instrumentation.count("sentences_evicted")
+
+    def compact(self):
+        """
+        Removes the derived sentences that carry no information of their
+        own: a sentence B is dropped when the knowledge base also has a
+        sentence A inside it and the rest B - A (with the remaining
+        count), since those two together say the same as B. Empty
+        sentences are already never stored and duplicates are merged by
+        the set. Returns the number of removed sentences.
+
+        Observed sentences are kept even then: the subset rule cannot
+        rebuild B from its parts, while a derived B is deduced again
+        when it is needed (see `_forget`).
+        """
+        removed = 0
+        for sentence in list(self._derived):
+            if sentence not in self._derived:
+                continue
+            inside = set()
+            for cell in sentence.cells:
+                inside.update(self.index.get(cell, ()))
+            for part in inside:
+                if not part.cells < sentence.cells:
+                    continue
+                rest = Sentence(sentence.cells - part.cells, sentence.count - part.count)
+                if rest not in self.knowledge:
+                    continue
+                self._forget(sentence)
+                removed += 1
+                break
+        if self.instrumentation is not None:
+            self.instrumentation.count("sentences_compacted", removed)
+        return removed
+
+    def _forget(self, sentence):
+        """
+        Removes a derived sentence that could be needed again, noting
+        its cells so that cross_check deduces it again once a sentence
+        it would be compared with is checked.
+        """
+        cells = sentence.cells - self._forgotten
+        if cells:
+            self._forgotten.update(cells)
+            if self._trail is not None:
+                self._trail.append((self._forgotten.difference_update, cells))
+        self._remove_sentence(sentence)
+
+    def _remove_sentence(self, sentence):
+        """
+        Removes a sentence from the knowledge base and the index.
+        """
+        if self._trail is not None and sentence in self.knowledge:
+            self._trail.append((self._insert, sentence, sentence in self._derived))
+        self._delete(sentence)
+
+    def _delete(self, sentence):
+        self.knowledge.discard(sentence)
+        self._derived.pop(sentence, None)
+        for cell in sentence.cells:
+            sentences = self.index.get(cell)
+            if sentences is not None:
+                sentences.discard(sentence)
+                if not sentences:
+                    del self.index[cell]
 
     def mark_mine(self, cell):
         """
@@ -202,9 +900,19 @@ class MinesweeperAI:
         """
         Es una función que permite marcar todas aquellas celdas que se pasen por parámetro, para que 
         de esta forma se actualicen en las base de conocimiento de todas aquellas que son consideradas como minas"""
+        if cell in self.mines:
+            return
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        if self._trail is not None:
+            self._trail.append((self.mines.discard, cell))
+        self._remove_from_pool(cell)
+        for sentence in self.index.pop(cell, ()):
+            derived = sentence in self._derived
+            self._remove_sentence(sentence)
+            reduced = sentence.mark_mine(cell)
+            if not reduced.cells and self.instrumentation is not None:
+                self.instrumentation.count("sentences_emptied")
+            self._add_sentence(reduced, derived)
 
     def mark_safe(self, cell):
         """
@@ -214,9 +922,46 @@ class MinesweeperAI:
         """
         o	Actualiza la base de conocimiento de todas aquellas celdas que han sido pasadas como parámetro y 
         que son consideradas como espacios seguros, para de esta manera la IA"""
+        if cell in self.safes:
+            return
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        if self._trail is not None:
+            self._trail.append((self.safes.discard, cell))
+        if cell not in self.moves_made:
+            self._push_safe(cell)
+        for sentence in self.index.pop(cell, ()):
+            derived = sentence in self._derived
+            self._remove_sentence(sentence)
+            reduced = sentence.mark_safe(cell)
+            if not reduced.cells and self.instrumentation is not None:
+                self.instrumentation.count("sentences_emptied")
+            self._add_sentence(reduced, derived)
+
+    def _push_safe(self, cell):
+        """
+        Queues a newly discovered safe cell for make_safe_move.
+        """
+        if self.safe_order == "information":
+            unknown = sum(
+                1 for c in neighbours(cell, self.height, self.width)
+                if c not in self.safes and c not in self.mines
+            )
+            entry = (-unknown, cell)
+            heapq.heappush(self._safe_queue, entry)
+            if self._trail is not None:
+                self._trail.append((self._unpush_safe, entry))
+        else:
+            self._safe_queue.append(cell)
+            if self._trail is not None:
+                self._trail.append((self._safe_queue.pop,))
+
+    def _unpush_safe(self, entry):
+        """
+        Undoes a push of `_push_safe` onto the heap of safe cells. The
+        entry is only noted here: `restore` takes out all of them at
+        once and rebuilds the heap.
+        """
+        self._unpushed.append(entry)
 
     def cross_check(self):
         """
@@ -224,22 +969,95 @@ class MinesweeperAI:
         para así determinar el subconjunto de preposiciones que forman parte de esa base de
         conocimiento, misma que surge de la comparación entre de los elementos ya mencionados
         """
-        kn_bef = self.knowledge.copy()
-        for i in range(0, len(kn_bef) - 1):
-            for j in range(i + 1, len(kn_bef)):
-                sent1 = kn_bef[i]
-                sent2 = kn_bef[j]
-                if (sent1.cells and sent2.cells):
-                    print("Sen1.cells\n",sent1.cells)
-                    print("Sen2.cells\n",sent2.cells)
-                    if sent1.cells.issubset(sent2.cells):
-                        new_sent = Sentence(
-                            sent2.cells - sent1.cells,
-                            sent2.count - sent1.count
-                        )
-                        if new_sent not in self.knowledge:
-                            self.knowledge.append(new_sent)
-                            print(self.knowledge)
+        """
+        Only the sentences that changed since the last call are compared,
+        and only against the sentences that share at least one cell with
+        them (found through `self.index`). With inference="linear", the
+        groups of those sentences are then also row-reduced (`eliminate`),
+        so that engine finds everything this rule finds and more.
+        """
+        to_check = self._to_check
+        self._to_check = set()
+        for sent1 in to_check:
+            if sent1 not in self.knowledge:
+                continue
+            forgotten = sent1.cells & self._forgotten
+            if forgotten:
+                # Las sentencias de las que salió lo olvidado se revisan
+                # otra vez (en la siguiente vuelta) para volver a deducirlo
+                self._forgotten -= forgotten
+                if self._trail is not None:
+                    self._trail.append((self._forgotten.update, forgotten))
+                for cell in forgotten:
+                    self._to_check.update(self.index.get(cell, ()))
+            neighbours = set()
+            for cell in sent1.cells:
+                neighbours.update(self.index.get(cell, ()))
+            neighbours.discard(sent1)
+            for sent2 in neighbours:
+                if sent1.cells <= sent2.cells:
+                    new_sent = Sentence(
+                        sent2.cells - sent1.cells,
+                        sent2.count - sent1.count
+                    )
+                elif sent2.cells <= sent1.cells:
+                    new_sent = Sentence(
+                        sent1.cells - sent2.cells,
+                        sent1.count - sent2.count
+                    )
+                else:
+                    continue
+                if self.instrumentation is not None:
+                    self.instrumentation.count("subset_inferences")
+                self._add_sentence(new_sent, derived=True)
+        if self.inference == "linear":
+            self.eliminate(to_check)
+
+    def eliminate(self, sentences):
+        """
+        Linear inference backend: every group of linked sentences that
+        contains one of `sentences` is row-reduced as a whole (see
+        solver.linear_deductions), which also finds the deductions that
+        need three or more sentences, and the forced cells are marked.
+        """
+        stats = self.instrumentation
+        for group in self._linked_groups(sentences):
+            safes, mines = solver.linear_deductions(group)
+            if stats is not None:
+                stats.count("linear_eliminations")
+                if safes:
+                    stats.count("safes_derived", len(safes))
+                    stats.event("safes", cells=sorted(safes), sentence="linear")
+                if mines:
+                    stats.count("mines_derived", len(mines))
+                    stats.event("mines", cells=sorted(mines), sentence="linear")
+            for cell in safes:
+                self.mark_safe(cell)
+            for cell in mines:
+                self.mark_mine(cell)
+
+    def _linked_groups(self, sentences):
+        """
+        Returns the groups of linked sentences (as in solver.components)
+        that contain any of the given sentences, found by walking
+        `self.index` from them, so that the cost depends on the part of
+        the frontier that changed and not on the whole knowledge base.
+        """
+        groups = []
+        seen = set()
+        for start in sentences:
+            if start in seen or start not in self.knowledge:
+                continue
+            seen.add(start)
+            group = [start]
+            for sentence in group:
+                for cell in sentence.cells:
+                    for other in self.index.get(cell, ()):
+                        if other not in seen:
+                            seen.add(other)
+                            group.append(other)
+            groups.append(group)
+        return groups
 
     def infer(self):
         """
@@ -250,23 +1068,36 @@ class MinesweeperAI:
         para que estos pasen a formar parte de los conjuntos de casillas seguras y al mismo tiempo al conjunto
         de casillas que contienen una mina
         """
-        for sent in self.knowledge:
-            for cell in sent.known_safes().copy():
-                self.mark_safe(cell)
-            for cell in sent.known_mines().copy():
-                self.mark_mine(cell)
+        while self._dirty:
+            sent = self._dirty.popleft()
+            if sent not in self.knowledge:
+                continue
+            safes = sent.known_safes()
+            mines = sent.known_mines()
+            stats = self.instrumentation
+            if safes:
+                if stats is not None:
+                    stats.count("safes_derived", len(safes))
+                    stats.event("safes", cells=sorted(safes), sentence=str(sent))
+                for cell in safes:
+                    self.mark_safe(cell)
+            elif mines:
+                if stats is not None:
+                    stats.count("mines_derived", len(mines))
+                    stats.event("mines", cells=sorted(mines), sentence=str(sent))
+                for cell in mines:
+                    self.mark_mine(cell)
+            else:
+                # Sin deducción directa: queda pendiente para cross_check()
+                self._to_check.add(sent)
 
 
     def neighbours(self, cell):
         """
         o	Permite calcular a los vecinos a partir de la posición de una determinada celda que se le
-        incorpora como parámetro, para así utilizar la operación de producto cartesiano y poder determinar
-        el espacio de coordenadas de los vecinos alrededor
+        incorpora como parámetro
         """
-        size = 8
-        for c in product(*(range(n - 1, n + 2) for n in cell)):
-            if c != cell and all(0 <= n < size for n in c):
-                yield c
+        return neighbours(cell, self.height, self.width)
 
     def add_knowledge(self, cell, count):
         """
@@ -292,23 +1123,153 @@ class MinesweeperAI:
         , para así finalmente incorporar las posiciones relativas de los vecinos dentro de la base de conocimiento,
         y luego realizar el respectivo proceso de inferencia y la incorporación de nuevas sentencias dentro de 
         la misma"""
-        self.moves_made.add(cell)
+        self.add_knowledge_batch({cell: count})
+
+    def add_knowledge_batch(self, counts):
+        """
+        Same as `add_knowledge` for many revealed cells at once (for
+        example the result of Minesweeper.reveal), given as a dict
+        {cell: count}. All the cells are marked as safe before their
+        sentences are built, and the inference runs only once.
+        """
+        stats = self.instrumentation
+        if stats is not None:
+            start = time.perf_counter()
+
+        for cell in counts:
+            if self._trail is not None and cell not in self.moves_made:
+                self._trail.append((self.moves_made.discard, cell))
+            self.moves_made.add(cell)
+            self._remove_from_pool(cell)
+            self.mark_safe(cell)
 
-        self.mark_safe(cell)
+        state, height, width = self.cells.state, self.height, self.width
+        for cell, count in counts.items():
+            cells = set()
 
-        cells = set()
+            for c in neighbours(cell, height, width):
+                flags = state[c[0] * width + c[1]]
+                if flags & CellState.MINE:
+                    # Una mina conocida se descuenta del conteo
+                    count -= 1
+                elif not flags & CellState.SAFE:
+                    cells.add(c)
 
-        for c in self.neighbours(cell):
-            if c not in self.safes:
-                cells.add(c)
+            self._add_sentence(Sentence(cells, count))
 
-        sent = Sentence(cells, count)
+        if stats is not None:
+            phases = {"mark": time.perf_counter() - start, "infer": 0.0,
+                      "cross_check": 0.0, "endgame": 0.0}
 
-        self.knowledge.append(sent)
+        # Se itera hasta que ninguna sentencia quede pendiente y el conteo
+        # total de minas no aporte nada más
+        while True:
+            if stats is None:
+                if self._dirty or self._to_check:
+                    self.infer()
+                    self.cross_check()
+                elif not self._endgame():
+                    break
+                continue
+            start = time.perf_counter()
+            if self._dirty or self._to_check:
+                self.infer()
+                middle = time.perf_counter()
+                self.cross_check()
+                phases["infer"] += middle - start
+                phases["cross_check"] += time.perf_counter() - middle
+                continue
+            progress = self._endgame()
+            phases["endgame"] += time.perf_counter() - start
+            if not progress:
+                break
 
-        self.infer()
-        self.cross_check()
-        self.infer()
+        # Compactación automática cada vez que la base duplica su tamaño
+        if len(self.knowledge) > self._compact_at:
+            self.compact()
+            self._compact_at = max(COMPACT_MIN, 2 * len(self.knowledge))
+        if self.max_knowledge is not None:
+            self._evict()
+
+        if stats is not None:
+            stats.updates += 1
+            for phase, seconds in phases.items():
+                stats.timings[phase] += seconds
+            stats.event("update", cells=sorted(counts), **phases)
+
+    def _endgame(self):
+        """
+        Uses the number of mines left on the whole board. When it alone
+        decides every unknown cell, they are all marked through one
+        global sentence. Otherwise, once there are at most
+        `endgame_cells` unknown cells, the frontier components are
+        enumerated and the mine count rules out some of their mine
+        totals (see solver.feasible_counts): a component left with a
+        single possible total is row-reduced with that total, and so is
+        the interior (the unknown cells outside every sentence).
+
+        Returns whether anything new was learned. Outside the endgame it
+        only compares a few counters, and it does nothing twice for the
+        same state.
+        """
+        unknown = self.height * self.width - len(self.safes) - len(self.mines)
+        mines_left = self.total_mines - len(self.mines)
+        key = (unknown, mines_left, len(self.knowledge))
+        if not unknown or key == self._endgame_key:
+            return False
+        if unknown > self.endgame_cells and 0 < mines_left < unknown:
+            return False
+        self._endgame_key = key
+
+        # Las celdas desconocidas son las del pool que no se saben seguras
+        cells = (divmod(index, self.width) for index in self._pool)
+        if mines_left in (0, unknown):
+            self._add_sentence(Sentence(
+                [cell for cell in cells if cell not in self.safes], mines_left
+            ), derived=True)
+            return True
+
+        # Cotas baratas del total de minas de la frontera: si ninguna de las
+        # dos toca los límites que impone el conteo global, no hay nada que ganar
+        frontier = len(self.index)
+        low = max((s.count for s in self.knowledge), default=0)
+        high = min(frontier, sum(s.count for s in self.knowledge))
+        if high < mines_left and low > mines_left - (unknown - frontier):
+            return False
+
+        groups = solver.components(self.knowledge)
+        interior = [
+            cell for cell in cells
+            if cell not in self.index and cell not in self.safes
+        ]
+        try:
+            counts = [set(solved) for solved in
+                      solver.solve_components(groups, pool=self.pool,
+                                              workers=self.workers)]
+        except solver.SolverBudgetExceeded:
+            return False
+        feasible, interior_mines = solver.feasible_counts(counts, len(interior), mines_left)
+
+        learned = False
+        if interior and len(interior_mines) == 1:
+            sentence = Sentence(interior, interior_mines.pop())
+            if sentence.known_safes() or sentence.known_mines():
+                self._add_sentence(sentence, derived=True)
+                learned = True
+        for group, possible, total in zip(groups, counts, feasible):
+            if len(total) != 1 or len(possible) == 1:
+                continue
+            # La componente tiene un total de minas fijo: es una sentencia más
+            group_cells = frozenset().union(*(s.cells for s in group))
+            safe_cells, mine_cells = solver.linear_deductions(
+                group + [Sentence(group_cells, next(iter(total)))]
+            )
+            for cell in safe_cells:
+                self.mark_safe(cell)
+            for cell in mine_cells:
+                self.mark_mine(cell)
+            learned = learned or bool(safe_cells or mine_cells)
+        return learned
 
     def make_safe_move(self):
         """
@@ -324,12 +1285,22 @@ class MinesweeperAI:
         que garantiza la IA que dentro de la casilla que se este a posteriori a visualizar es segura 
         de que no va arrojar una mina
         """
-        if len(self.mines) == 8:
+        if len(self.mines) == self.total_mines:
             return None
-        for cell in self.safes:
-            if cell not in self.moves_made and cell not in self.mines:
-                return cell
-        return None
+        # Las celdas que ya se jugaron (o que dejaron de ser seguras al
+        # deshacer cambios) se descartan al llegar al frente de la cola
+        queue, trail = self._safe_queue, self._trail
+        if self.safe_order == "information":
+            while queue and (queue[0][1] in self.moves_made or queue[0][1] not in self.safes):
+                entry = heapq.heappop(queue)
+                if trail is not None:
+                    trail.append((heapq.heappush, queue, entry))
+            return queue[0][1] if queue else None
+        while queue and (queue[0] in self.moves_made or queue[0] not in self.safes):
+            cell = queue.popleft()
+            if trail is not None:
+                trail.append((queue.appendleft, cell))
+        return queue[0] if queue else None
 
     def make_random_move(self):
         # print('make_random_move')
@@ -340,16 +1311,184 @@ class MinesweeperAI:
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        if len(self.mines) == 8:# En caso de que el conjutno de minas sea equivalente a 8
+        if len(self.mines) == self.total_mines:# En caso de que ya se conozcan todas las minas
             return None
-        possible_moves = [] # Arreglo en donde se alojarán, los movimientos
-        for i in range(self.height):
-            for j in range(self.width):
-                if (i, j) not in self.moves_made:
-                    possible_moves.append((i, j)) # Se genera el espacio de posibles movimientos excluyendo los ya mostrados
-        while len(possible_moves) != 0:
-            index = random.randrange(len(possible_moves)) # Se obtiene un idex de forma aleatorio conforme al espaciode movimientos
-            if possible_moves[index] not in self.mines: # Se comprueba qu el movimiento no pertenece a las casillas del conjunto de minas
-                return possible_moves[index] # Se retorna el movimiento asociado al indice
-            possible_moves.pop(index) # Se elimina ese movimiento de la lista de movimientos acorde al indice en caso de pertenecer al conjunto de minas
-        return None
+        if not self._pool: # No quedan celdas sin jugar que no sean minas
+            return None
+        # El pool solo contiene movimientos posibles: basta un sorteo
+        return divmod(self._pool[random.randrange(len(self._pool))], self.width)
+
+    def _remove_from_pool(self, cell):
+        """
+        Removes a cell from the pool of possible random moves, moving
+        the last cell of the pool into its slot (swap-remove).
+        """
+        i, j = cell
+        index = i * self.width + j
+        slot = self._pool_slot[index]
+        if slot < 0:
+            return
+        last = self._pool.pop()
+        if last != index:
+            self._pool[slot] = last
+            self._pool_slot[last] = slot
+        self._pool_slot[index] = -1
+        if self._trail is not None:
+            self._trail.append((self._restore_to_pool, index, slot))
+
+    def _restore_to_pool(self, index, slot):
+        """
+        Undoes `_remove_from_pool`, putting every cell back in its slot.
+        """
+        if slot < len(self._pool):
+            last = self._pool[slot]
+            self._pool_slot[last] = len(self._pool)
+            self._pool.append(last)
+            self._pool[slot] = index
+        else:
+            self._pool.append(index)
+        self._pool_slot[index] = slot
+
+    def checkpoint(self):
+        """
+        Returns a token to go back to the current state of the AI with
+        `restore`. While any checkpoint is held, every change is
+        recorded in a trail of undo steps, so a checkpoint costs nothing
+        and restoring costs as much as the changes made since; `release`
+        the token once it is no longer needed, or the trail keeps
+        growing. Must be called between knowledge updates.
+        """
+        if self._trail is None:
+            self._trail = []
+        mark = object()
+        self._checkpoints.append(mark)
+        return mark, len(self._trail), self._compact_at, self._endgame_key
+
+    def _held(self, token):
+        """
+        Returns the position of a checkpoint among those still held.
+        """
+        mark = token[0]
+        for position, held in enumerate(self._checkpoints):
+            if held is mark:
+                return position
+        raise ValueError("checkpoint already released or not taken on this AI")
+
+    def restore(self, token):
+        """
+        Undoes every change made since `checkpoint` returned `token`.
+        Checkpoints can be nested, and restoring one also releases those
+        taken after it; the token itself stays valid until released.
+        Raises ValueError for a released token. The only thing not put
+        back exactly is the age of the derived sentences brought back,
+        which count as the newest ones for `max_knowledge`.
+        """
+        held = self._held(token)
+        del self._checkpoints[held + 1:]
+        _, position, self._compact_at, self._endgame_key = token
+        trail = self._trail
+        while len(trail) > position:
+            undo, *args = trail.pop()
+            undo(*args)
+
+        if self._unpushed:
+            # Mientras tanto el heap sigue siendo válido con las entradas de
+            # más, así que deshacer un heappop con heappush era correcto
+            removed = Counter(self._unpushed)
+            self._unpushed = []
+            kept = []
+            for entry in self._safe_queue:
+                if removed[entry]:
+                    removed[entry] -= 1
+                else:
+                    kept.append(entry)
+            self._safe_queue[:] = kept
+            heapq.heapify(self._safe_queue)
+
+    def release(self, token):
+        """
+        Keeps the changes made since `checkpoint` returned `token` and
+        forgets that checkpoint and those taken after it. Once no
+        checkpoint is held, changes are no longer recorded.
+        Raises ValueError for a released token.
+        """
+        del self._checkpoints[self._held(token):]
+        if not self._checkpoints:
+            self._trail = None
+
+    @contextmanager
+    def branch(self):
+        """
+        Context manager for a hypothetical line of play: whatever the
+        AI learns inside the `with` block is undone on exit, e.g.
+
+            with ai.branch():
+                ai.add_knowledge(cell, 3)
+                safe = ai.make_safe_move()
+        """
+        token = self.checkpoint()
+        try:
+            yield self
+        finally:
+            self.restore(token)
+            self.release(token)
+
+    def mine_probabilities(self):
+        """
+        Returns the probability of each unknown cell being a mine, as a
+        pair (probabilities, interior): `probabilities` maps every cell
+        mentioned in the knowledge base to its probability, and
+        `interior` is the probability shared by every other unknown cell
+        (None if there are none).
+
+        How they are computed depends on `self.probability`. In "exact"
+        mode, raises solver.SolverBudgetExceeded if a component of the
+        frontier is too big to be enumerated; "auto" samples that
+        component instead and combines it with the exact ones.
+        """
+        unknown = self.height * self.width - len(self.safes) - len(self.mines)
+        mines_left = self.total_mines - len(self.mines)
+        if self.probability != "sample":
+            return solver.mine_probabilities(
+                self.knowledge, unknown, mines_left, pool=self.pool,
+                workers=self.workers, sample=self.probability == "auto",
+                steps=self.sample_steps, time_limit=self.sample_time
+            )
+        return solver.sample_probabilities(
+            self.knowledge, unknown, mines_left,
+            steps=self.sample_steps, time_limit=self.sample_time
+        )
+
+    def make_guess_move(self):
+        """
+        Returns the unrevealed cell with the lowest probability of being
+        a mine, according to `mine_probabilities`. Falls back to
+        `make_random_move` if the probabilities cannot be computed.
+        """
+        if len(self.mines) == self.total_mines:
+            return None
+        try:
+            probabilities, interior = self.mine_probabilities()
+        except solver.SolverBudgetExceeded:
+            return self.make_random_move()
+
+        best = None
+        if probabilities:
+            best = min(probabilities, key=lambda cell: (probabilities[cell], cell))
+        if interior is not None and (best is None or interior < probabilities[best]):
+            # Cualquier celda fuera de la frontera tiene el mismo riesgo:
+            # se sortean celdas del pool hasta dar con una
+            pool = self._pool
+            for _ in range(64):
+                cell = divmod(pool[random.randrange(len(pool))], self.width)
+                if cell not in self.index and cell not in self.safes:
+                    return cell
+            candidates = [
+                cell for cell in (divmod(index, self.width) for index in pool)
+                if cell not in self.index and cell not in self.safes
+            ]
+            if candidates:
+                return random.choice(candidates)
+        if best is None:
+            return self.make_random_move()
+        return best
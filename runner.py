@@ -1,13 +1,24 @@
 import pygame
+import queue
 import sys
-import time
+import threading
 
-from minesweeper import Minesweeper, MinesweeperAI
+from minesweeper import MinesweeperAI, Session
 
 HEIGHT = 8
 WIDTH = 8
 MINES = 8
 
+# Fotogramas por segundo como máximo
+FPS = 30
+
+# Jugadas por segundo del modo de juego automático
+AUTO_PLAY_RATE = 5
+
+# Eventos propios: jugada calculada por el AI y turno del juego automático
+AI_MOVE = pygame.USEREVENT + 1
+AUTO_PLAY = pygame.USEREVENT + 2
+
 # Colors
 BLACK = (0, 0, 0)
 GRAY = (180, 180, 180)
@@ -17,6 +28,7 @@ WHITE = (255, 255, 255)
 pygame.init()
 size = width, height = 600, 400
 screen = pygame.display.set_mode(size)
+clock = pygame.time.Clock()
 
 # Fonts
 OPEN_SANS = "assets/fonts/OpenSans-Regular.ttf"
@@ -37,186 +49,330 @@ flag = pygame.transform.scale(flag, (cell_size, cell_size))
 mine = pygame.image.load("assets/images/mine.png")
 mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
+# Textos que no cambian: se renderizan una sola vez
+numbers = [smallFont.render(str(n), True, BLACK) for n in range(9)]
+title = largeFont.render("Play Minesweeper", True, WHITE)
+rules = [
+    smallFont.render(rule, True, WHITE) for rule in (
+        "Click a cell to reveal it.",
+        "Right-click a cell to mark it as a mine.",
+        "Mark all mines or reveal every safe cell to win!"
+    )
+]
+playText = mediumFont.render("Play Game", True, BLACK)
+aiText = mediumFont.render("AI Move", True, BLACK)
+autoText = mediumFont.render("Auto Play", True, BLACK)
+cancelText = mediumFont.render("Cancel", True, BLACK)
+resetText = mediumFont.render("Reset", True, BLACK)
+statusTexts = {text: mediumFont.render(text, True, WHITE) for text in ("", "Lost", "Won")}
+
+# Rectángulos de las celdas y de los botones
+cells = [
+    [
+        pygame.Rect(
+            board_origin[0] + j * cell_size,
+            board_origin[1] + i * cell_size,
+            cell_size, cell_size
+        )
+        for j in range(WIDTH)
+    ]
+    for i in range(HEIGHT)
+]
+playButton = pygame.Rect((width / 4), (3 / 4) * height, width / 2, 50)
+aiButton, autoButton, cancelButton, resetButton = (
+    pygame.Rect(
+        (2 / 3) * width + BOARD_PADDING, BOARD_PADDING + 60 * n,
+        (width / 3) - BOARD_PADDING * 2, 50
+    )
+    for n in range(4)
+)
+statusRect = pygame.Rect((2 / 3) * width, (3 / 4) * height - 25, width / 3, 50)
+
+
+class AIWorker(threading.Thread):
+    """
+    Runs the AI on a background thread so that the window keeps
+    responding while it thinks. The UI sends it requests through a
+    queue: ("knowledge", {cell: count}) for revealed cells and ("move",
+    generation) to ask for a move, which is answered by posting an
+    AI_MOVE event with the move, whether it is known to be safe, the
+    mines it knows and the generation of the request.
+    """
+
+    def __init__(self, ai):
+        super().__init__(daemon=True)
+        self.ai = ai
+        self.requests = queue.Queue()
+
+    def run(self):
+        while True:
+            kind, payload = self.requests.get()
+            if kind == "stop":
+                return
+            if kind == "knowledge":
+                self.ai.add_knowledge_batch(payload)
+                continue
+            move = self.ai.make_safe_move()
+            safe = move is not None
+            if move is None:
+                move = self.ai.make_guess_move()
+            pygame.event.post(pygame.event.Event(
+                AI_MOVE, move=move, safe=safe,
+                mines=self.ai.mines.copy(), generation=payload
+            ))
+
 # Create game and AI agent
-game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+session = Session(height=HEIGHT, width=WIDTH, mines=MINES)
+worker = AIWorker(MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES))
+worker.start()
 
-# Keep track of revealed cells, flagged cells, and if a mine was hit
-revealed = set()
-flags = set()
-lost = False
+# Jugada pedida al AI y aún sin respuesta (su número de petición, o None),
+# número de la última petición (las respuestas anteriores se descartan)
+# y si el juego automático está activo
+pending = None
+generation = 0
+auto_play = False
 
 # Show instructions initially
 instructions = True
 
+# Celdas a redibujar en el próximo fotograma; `full` redibuja toda la pantalla
+dirty = set()
+buttons_dirty = set()
+full = True
+status = None
+
+
+def blit_centered(surface, rect):
+    """
+    Draws a pre-rendered surface centered on a rect.
+    """
+    target = surface.get_rect()
+    target.center = rect.center
+    screen.blit(surface, target)
+
+
+def draw_button(rect, text, active=False):
+    pygame.draw.rect(screen, GRAY if active else WHITE, rect)
+    blit_centered(text, rect)
+    return rect
+
+
+def request_move():
+    """
+    Asks the AI worker for a move, unless one is already on its way.
+    """
+    global pending, generation
+    if pending is None:
+        generation += 1
+        pending = generation
+        worker.requests.put(("move", generation))
+
+
+def set_auto_play(active):
+    """
+    Starts or stops the auto-play timer.
+    """
+    global auto_play
+    if active != auto_play:
+        auto_play = active
+        pygame.time.set_timer(AUTO_PLAY, int(1000 / AUTO_PLAY_RATE) if active else 0)
+        buttons_dirty.add(autoButton)
+
+
+def draw_cell(cell):
+    """
+    Draws one cell of the board and returns its rect.
+    """
+    i, j = cell
+    rect = cells[i][j]
+    pygame.draw.rect(screen, GRAY, rect)
+    pygame.draw.rect(screen, WHITE, rect, 3)
+
+    # Add a mine, flag, or number if needed
+    if session.lost and session.game.is_mine(cell):
+        screen.blit(mine, rect)
+    elif cell in session.flags:
+        screen.blit(flag, rect)
+    elif cell in session.revealed:
+        blit_centered(numbers[session.game.nearby_mines(cell)], rect)
+    return rect
+
+
+def draw_status(text):
+    pygame.draw.rect(screen, BLACK, statusRect)
+    blit_centered(statusTexts[text], statusRect)
+    return statusRect
+
+
+def cell_at(position):
+    """
+    Returns the board cell under a pixel position, or None.
+    """
+    x, y = position
+    i = (y - board_origin[1]) // cell_size
+    j = (x - board_origin[0]) // cell_size
+    if 0 <= i < HEIGHT and 0 <= j < WIDTH:
+        return int(i), int(j)
+    return None
+
+
 while True:
 
-    # Check if game quit
-    for event in pygame.event.get():
+    # Sin eventos no hay nada que cambie: se espera al siguiente sin gastar CPU
+    events = [pygame.event.wait()]
+    events.extend(pygame.event.get())
+
+    for event in events:
+
+        # Check if game quit
         if event.type == pygame.QUIT:
             sys.exit()
 
-    screen.fill(BLACK)
+        # La ventana se tapó o cambió: hay que redibujarla entera
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            full = True
+            continue
 
-    # Show game instructions
-    if instructions:
+        move = None
+
+        # Respuesta del AI: se descarta si se pidió antes de un reset o un cancel
+        if event.type == AI_MOVE:
+            if event.generation != pending:
+                continue
+            pending = None
+            if session.state() != "playing" or event.move in session.revealed:
+                # La partida o el tablero cambiaron mientras el AI pensaba
+                continue
+            move = event.move
+            if move is None:
+                dirty.update(session.flags ^ event.mines)
+                session.flags = set(event.mines)
+                set_auto_play(False)
+                print("No moves left to make.")
+            elif event.safe:
+                print("AI making safe move.")
+            else:
+                print("No known safe moves, AI making lowest-risk guess.")
+
+        # Turno del juego automático
+        elif event.type == AUTO_PLAY:
+            if session.state() != "playing":
+                set_auto_play(False)
+            else:
+                request_move()
+            continue
 
-        # Title
-        title = largeFont.render("Play Minesweeper", True, WHITE)
-        titleRect = title.get_rect()
-        titleRect.center = ((width / 2), 50)
-        screen.blit(title, titleRect)
-
-        # Rules
-        rules = [
-            "Click a cell to reveal it.",
-            "Right-click a cell to mark it as a mine.",
-            "Mark all mines successfully to win!"
-        ]
-        for i, rule in enumerate(rules):
-            line = smallFont.render(rule, True, WHITE)
-            lineRect = line.get_rect()
-            lineRect.center = ((width / 2), 150 + 30 * i)
-            screen.blit(line, lineRect)
-
-        # Play game button
-        buttonRect = pygame.Rect((width / 4), (3 / 4) * height, width / 2, 50)
-        buttonText = mediumFont.render("Play Game", True, BLACK)
-        buttonTextRect = buttonText.get_rect()
-        buttonTextRect.center = buttonRect.center
-        pygame.draw.rect(screen, WHITE, buttonRect)
-        screen.blit(buttonText, buttonTextRect)
+        elif event.type != pygame.MOUSEBUTTONDOWN:
+            continue
 
         # Check if play button clicked
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1:
-            mouse = pygame.mouse.get_pos()
-            if buttonRect.collidepoint(mouse):
+        elif instructions:
+            if event.button == 1 and playButton.collidepoint(event.pos):
                 instructions = False
-                time.sleep(0.3)
+                full = True
+            continue
 
-        pygame.display.flip()
+        # Check for a right-click to toggle flagging
+        elif event.button == 3:
+            cell = cell_at(event.pos)
+            if (cell is not None and session.state() == "playing"
+                    and cell not in session.revealed):
+                session.flag(cell)
+                dirty.add(cell)
+
+        elif event.button == 1:
+            cell = cell_at(event.pos)
+
+            # If AI button clicked, ask the AI worker for a move
+            if aiButton.collidepoint(event.pos) and session.state() == "playing":
+                request_move()
+
+            # El juego automático pide una jugada a cada tick del temporizador
+            elif autoButton.collidepoint(event.pos) and session.state() == "playing":
+                set_auto_play(True)
+                request_move()
+
+            # Cancel: para el juego automático y descarta la jugada pedida
+            elif cancelButton.collidepoint(event.pos):
+                set_auto_play(False)
+                pending = None
+
+            # Reset game state
+            elif resetButton.collidepoint(event.pos):
+                set_auto_play(False)
+                pending = None
+                worker.requests.put(("stop", None))
+                worker = AIWorker(MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES))
+                worker.start()
+                session = Session(height=HEIGHT, width=WIDTH, mines=MINES)
+                full = True
+
+            # User-made move
+            elif (cell is not None and session.state() == "playing"
+                    and cell not in session.flags and cell not in session.revealed):
+                move = cell
+
+        # Make move and update AI knowledge
+        if move:
+            # Se descubre la celda y, si no tiene minas vecinas, toda su zona;
+            # el AI lo aprende en su hilo
+            newly_revealed = session.reveal(move)
+            if session.lost:
+                set_auto_play(False)
+                # Se muestran todas las minas
+                dirty.update(session.game.mines)
+            else:
+                worker.requests.put(("knowledge", newly_revealed))
+                dirty.update(newly_revealed)
+
+    # Show game instructions
+    if instructions:
+        if full:
+            screen.fill(BLACK)
+
+            # Title
+            titleRect = title.get_rect()
+            titleRect.center = ((width / 2), 50)
+            screen.blit(title, titleRect)
+
+            # Rules
+            for i, line in enumerate(rules):
+                lineRect = line.get_rect()
+                lineRect.center = ((width / 2), 150 + 30 * i)
+                screen.blit(line, lineRect)
+
+            # Play game button
+            draw_button(playButton, playText)
+            pygame.display.flip()
+            full = False
+        clock.tick(FPS)
         continue
 
-    # Draw board
-    cells = []
-    for i in range(HEIGHT):
-        row = []
-        for j in range(WIDTH):
-
-            # Draw rectangle for cell
-            rect = pygame.Rect(
-                board_origin[0] + j * cell_size,
-                board_origin[1] + i * cell_size,
-                cell_size, cell_size
-            )
-            pygame.draw.rect(screen, GRAY, rect)
-            pygame.draw.rect(screen, WHITE, rect, 3)
-
-            # Add a mine, flag, or number if needed
-            if game.is_mine((i, j)) and lost:
-                screen.blit(mine, rect)
-            elif (i, j) in flags:
-                screen.blit(flag, rect)
-            elif (i, j) in revealed:
-                neighbors = smallFont.render(
-                    str(game.nearby_mines((i, j))),
-                    True, BLACK
-                )
-                neighborsTextRect = neighbors.get_rect()
-                neighborsTextRect.center = rect.center
-                screen.blit(neighbors, neighborsTextRect)
-
-            row.append(rect)
-        cells.append(row)
-
-    # AI Move button
-    aiButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("AI Move", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = aiButton.center
-    pygame.draw.rect(screen, WHITE, aiButton)
-    screen.blit(buttonText, buttonRect)
-
-    # Reset button
-    resetButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("Reset", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = resetButton.center
-    pygame.draw.rect(screen, WHITE, resetButton)
-    screen.blit(buttonText, buttonRect)
-
-    # Display text
-    text = "Lost" if lost else "Won" if game.mines == flags else ""
-    text = mediumFont.render(text, True, WHITE)
-    textRect = text.get_rect()
-    textRect.center = ((5 / 6) * width, (2 / 3) * height)
-    screen.blit(text, textRect)
-
-    move = None
-
-    left, _, right = pygame.mouse.get_pressed()
-
-    # Check for a right-click to toggle flagging
-    if right == 1 and not lost:
-        mouse = pygame.mouse.get_pos()
+    # Solo se redibuja lo que cambió desde el último fotograma
+    text = {"lost": "Lost", "won": "Won"}.get(session.state(), "")
+    if full:
+        screen.fill(BLACK)
         for i in range(HEIGHT):
             for j in range(WIDTH):
-                if cells[i][j].collidepoint(mouse) and (i, j) not in revealed:
-                    if (i, j) in flags:
-                        flags.remove((i, j))
-                    else:
-                        flags.add((i, j))
-                    time.sleep(0.2)
-
-    elif left == 1:
-        mouse = pygame.mouse.get_pos()
-
-        # If AI button clicked, make an AI move
-        if aiButton.collidepoint(mouse) and not lost:
-            move = ai.make_safe_move()
-            if move is None:
-                move = ai.make_random_move()
-                if move is None:
-                    flags = ai.mines.copy()
-                    print("No moves left to make.")
-                else:
-                    print("No known safe moves, AI making random move.")
-            else:
-                print("AI making safe move.")
-            time.sleep(0.2)
-
-        # Reset game state
-        elif resetButton.collidepoint(mouse):
-            game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
-            revealed = set()
-            flags = set()
-            lost = False
-            continue
-
-        # User-made move
-        elif not lost:
-            for i in range(HEIGHT):
-                for j in range(WIDTH):
-                    if (cells[i][j].collidepoint(mouse)
-                            and (i, j) not in flags
-                            and (i, j) not in revealed):
-                        move = (i, j)
-
-    # Make move and update AI knowledge
-    if move:
-        if game.is_mine(move):
-            lost = True
-        else:
-            nearby = game.nearby_mines(move)
-            revealed.add(move)
-            ai.add_knowledge(move, nearby)
-
-    pygame.display.flip()
+                draw_cell((i, j))
+        draw_button(aiButton, aiText)
+        draw_button(autoButton, autoText, auto_play)
+        draw_button(cancelButton, cancelText)
+        draw_button(resetButton, resetText)
+        draw_status(text)
+        pygame.display.flip()
+        full = False
+    else:
+        rects = [draw_cell(cell) for cell in dirty]
+        if buttons_dirty:
+            rects.append(draw_button(autoButton, autoText, auto_play))
+        if text != status:
+            rects.append(draw_status(text))
+        if rects:
+            pygame.display.update(rects)
+    dirty.clear()
+    buttons_dirty.clear()
+    status = text
+
+    clock.tick(FPS)
@@ -0,0 +1,268 @@
+"""
+Asyncio server hosting many Minesweeper games over a TCP line protocol.
+
+Every request is one line of text and gets one line of JSON back:
+
+    new [HEIGHT WIDTH MINES [SEED]]   {"ok": true, "game": ID}
+    reveal ID I J                     {"ok": true, "state": ..., "cells": [[i, j, n], ...]}
+    flag ID I J                       {"ok": true, "state": ..., "flagged": true}
+    ai ID                             {"ok": true, "move": [i, j] or null, "safe": ...}
+    close ID                          {"ok": true}
+
+`state` is "playing", "won" or "lost". When the AI has no move left
+(it knows every mine), the answer to "ai" also has the known "mines".
+Errors are answered with {"ok": false, "error": MESSAGE}. The board of
+a game is placed at its first reveal, keeping that cell and its
+neighbours free of mines. A connection can hold at most MAX_SESSIONS
+open games of at most MAX_CELLS cells, and the games still open when
+it closes are discarded.
+
+Reveals run on a thread pool, and so does the AI, which is created at
+the first "ai" request and only learns the revealed cells when asked
+for a move, so that the event loop keeps serving the other games:
+
+    python server.py --port 8765
+    python loadtest.py --port 8765 --sessions 2000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import minesweeper
+from minesweeper import InvalidMove, MinesweeperAI
+
+
+# Tamaño máximo de un tablero y partidas abiertas por conexión: acotan la
+# memoria de cada conexión (una partida de 256x256 descubierta entera y su
+# AI ocupan unos 15 MB) y lo que tarda un reveal en el executor
+MAX_CELLS = 256 * 256
+MAX_SESSIONS = 8
+
+
+class ProtocolError(Exception):
+    """
+    Raised for a malformed or invalid request; the message goes back
+    to the client.
+    """
+
+
+class Session(minesweeper.Session):
+    """
+    One game (see minesweeper.Session, which sets its rules), the
+    revealed cells its AI has not learned yet, and the AI that can
+    play it.
+    """
+
+    def __init__(self, height, width, mines, seed=None):
+        if height < 1 or width < 1 or height * width > MAX_CELLS:
+            raise ProtocolError("bad board size")
+        if not 0 <= mines < height * width:
+            raise ProtocolError("bad number of mines")
+        super().__init__(height, width, mines, seed)
+        self.ai = None
+
+        # Celdas reveladas que el AI aún no conoce. `lock` protege el
+        # tablero mientras un reveal corre en el executor, y `thinking`
+        # hace que el AI de una partida piense en un solo hilo a la vez
+        self.pending = {}
+        self.lock = asyncio.Lock()
+        self.thinking = asyncio.Lock()
+
+    def cell(self, i, j):
+        if not (0 <= i < self.height and 0 <= j < self.width):
+            raise ProtocolError("cell out of the board")
+        return i, j
+
+    def reveal(self, cell):
+        """
+        Reveals a cell and returns the list of newly revealed
+        [i, j, nearby mines]. Runs on the executor.
+        """
+        revealed = super().reveal(cell)
+        self.pending.update(revealed)
+        return [[i, j, n] for (i, j), n in revealed.items()]
+
+    def think(self, revealed):
+        """
+        Teaches the AI the given revealed cells and returns its move as
+        (move, safe, mines), where `mines` are the mines the AI knows if
+        it has no move left. Runs on the executor.
+        """
+        if self.ai is None:
+            self.ai = MinesweeperAI(height=self.height, width=self.width, mines=self.mines)
+        if revealed:
+            self.ai.add_knowledge_batch(revealed)
+        move = self.ai.make_safe_move()
+        if move is not None:
+            return move, True, None
+        move = self.ai.make_guess_move()
+        return move, False, None if move is not None else sorted(self.ai.mines)
+
+
+class GameServer:
+    """
+    Serves the line protocol for every connection, keeping the games
+    of all of them in `sessions` (a game can be played from any
+    connection that knows its id, as long as the one that created it
+    stays open).
+    """
+
+    def __init__(self, executor=None):
+        self.sessions = {}
+        self.ids = itertools.count(1)
+        self.executor = executor
+        # Orden -> (método, mínimo y máximo de argumentos, todos enteros)
+        self.commands = {
+            "new": (self.new, 0, 4),
+            "reveal": (self.reveal, 3, 3),
+            "flag": (self.flag, 3, 3),
+            "ai": (self.ai, 1, 1),
+            "close": (self.close, 1, 1),
+        }
+
+    def session(self, game):
+        try:
+            return self.sessions[game]
+        except KeyError:
+            raise ProtocolError("unknown game") from None
+
+    def parse(self, words):
+        """
+        Returns the method and the integer arguments of a request, or
+        raises ProtocolError, so that a bad request is told apart from
+        an error while serving it.
+        """
+        command = self.commands.get(words[0])
+        if command is None:
+            raise ProtocolError(f"unknown command {words[0]!r}")
+        method, fewest, most = command
+        try:
+            args = [int(word) for word in words[1:]]
+        except ValueError:
+            args = None
+        if args is None or not fewest <= len(args) <= most:
+            raise ProtocolError(f"bad arguments for {words[0]}")
+        return method, args
+
+    async def new(self, height=8, width=8, mines=8, seed=None):
+        session = Session(height, width, mines, seed)
+        game = next(self.ids)
+        self.sessions[game] = session
+        return {"game": game}
+
+    async def reveal(self, game, i, j):
+        session = self.session(game)
+        cell = session.cell(i, j)
+        async with session.lock:
+            # Generar el tablero y descubrir una zona grande lleva tiempo
+            cells = await asyncio.get_running_loop().run_in_executor(
+                self.executor, session.reveal, cell
+            )
+            return {"state": session.state(), "cells": cells}
+
+    async def flag(self, game, i, j):
+        session = self.session(game)
+        cell = session.cell(i, j)
+        async with session.lock:
+            flagged = session.flag(cell)
+            return {"state": session.state(), "flagged": flagged}
+
+    async def ai(self, game):
+        session = self.session(game)
+        async with session.thinking:
+            # Lo revelado hasta ahora pasa al AI; lo que se revele mientras
+            # piensa queda para la próxima petición
+            async with session.lock:
+                revealed, session.pending = session.pending, {}
+            move, safe, mines = await asyncio.get_running_loop().run_in_executor(
+                self.executor, session.think, revealed
+            )
+        if move is None:
+            return {"move": None, "safe": safe, "mines": [list(cell) for cell in mines]}
+        return {"move": list(move), "safe": safe}
+
+    async def close(self, game):
+        self.session(game)
+        del self.sessions[game]
+        return {}
+
+    async def handle(self, reader, writer):
+        """
+        Answers the requests of one connection until it is closed.
+        """
+        created = set()
+        try:
+            while line := await reader.readline():
+                words = line.decode(errors="replace").split()
+                if not words:
+                    continue
+                try:
+                    method, args = self.parse(words)
+                    if words[0] == "new":
+                        # Solo cuentan las partidas de esta conexión que siguen abiertas
+                        created.intersection_update(self.sessions)
+                        if len(created) >= MAX_SESSIONS:
+                            raise ProtocolError("too many open games")
+                    result = await method(*args)
+                    if words[0] == "new":
+                        created.add(result["game"])
+                    response = {"ok": True, **result}
+                except (ProtocolError, InvalidMove) as e:
+                    response = {"ok": False, "error": str(e)}
+                except Exception:
+                    # Un fallo del servidor (no de la petición) se registra
+                    # y la conexión sigue atendiendo
+                    logging.exception("error serving %r", line)
+                    response = {"ok": False, "error": "internal error"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game in created:
+                self.sessions.pop(game, None)
+            writer.close()
+
+
+def raise_file_limit():
+    """
+    Raises the limit of open files as far as allowed, since every
+    connection takes one. Does nothing where the `resource` module does
+    not exist (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def serve(host, port, workers=None):
+    raise_file_limit()
+    server = GameServer(ThreadPoolExecutor(workers))
+    listener = await asyncio.start_server(server.handle, host, port, backlog=4096)
+    print(f"Serving on {host}:{port}", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-game Minesweeper server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="threads of the AI executor")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Headless self-play: plays many full games of Minesweeper against
+MinesweeperAI on a pool of processes and reports the win rate, the
+throughput and the latency of MinesweeperAI.add_knowledge.
+
+Every game is seeded with `seed + game number`, so a run gives the same
+results whatever the number of workers.
+
+    python simulate.py --games 10000 --height 16 --width 30 --mines 99
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
+# Subdivisiones por potencia de 2 del histograma de latencias
+BUCKETS_PER_OCTAVE = 8
+
+
+def play_game(height, width, mines, seed, latencies=None, safe_start=False,
+              inference="subset"):
+    """
+    Plays one game with the AI and returns (won, moves). Revealing a
+    cell with no nearby mines opens its whole zone, which the AI gets in
+    a single add_knowledge_batch call. If given, `latencies` is a
+    histogram {bucket: count} that gets the time of every knowledge
+    update (see `latency_bucket`).
+
+    With `safe_start`, the board is generated after the AI picks its
+    first move, keeping that cell and its neighbours free of mines.
+    `inference` selects the inference engine of the AI.
+    """
+    # La semilla fija el tablero y también (por separado) las jugadas al azar del AI
+    random.seed(f"ai:{seed}")
+    ai = MinesweeperAI(height=height, width=width, mines=mines, inference=inference)
+    move = ai.make_guess_move()
+    game = Minesweeper(height=height, width=width, mines=mines, seed=seed,
+                       safe=move if safe_start else None)
+    safe_cells = height * width - mines
+    moves = 0
+
+    while len(ai.moves_made) < safe_cells:
+        if move is None:
+            move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_guess_move()
+        if move is None:
+            break
+        moves += 1
+        if game.is_mine(move):
+            return False, moves
+
+        revealed = game.reveal(move)
+        move = None
+        start = time.perf_counter_ns()
+        ai.add_knowledge_batch(revealed)
+        if latencies is not None:
+            bucket = latency_bucket(time.perf_counter_ns() - start)
+            latencies[bucket] = latencies.get(bucket, 0) + 1
+
+    # Como en runner.py, también se gana cuando el AI conoce todas las minas
+    return len(ai.moves_made) == safe_cells or ai.mines == game.mines, moves
+
+
+def latency_bucket(nanoseconds):
+    """
+    Returns the histogram bucket of a latency (logarithmic buckets).
+    """
+    return int(math.log2(max(nanoseconds, 1)) * BUCKETS_PER_OCTAVE)
+
+
+def play_batch(args):
+    """
+    Plays `count` games starting at seed `first` and returns the
+    aggregated stats of the batch.
+    """
+    height, width, mines, first, count, safe_start, inference = args
+    stats = {"games": 0, "won": 0, "moves": 0, "latencies": {}}
+    for seed in range(first, first + count):
+        won, moves = play_game(height, width, mines, seed,
+                               stats["latencies"], safe_start, inference)
+        stats["games"] += 1
+        stats["won"] += won
+        stats["moves"] += moves
+    return stats
+
+
+def simulate(games, height=8, width=8, mines=8, seed=0, workers=None, chunk=None,
+             safe_start=False, inference="subset"):
+    """
+    Plays `games` games split in batches over `workers` processes
+    (all the CPUs by default) and returns the merged stats.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk = chunk or max(1, min(1000, games // (workers * 4) or 1))
+    batches = [
+        (height, width, mines, seed + first, min(chunk, games - first), safe_start,
+         inference)
+        for first in range(0, games, chunk)
+    ]
+
+    total = {"games": 0, "won": 0, "moves": 0, "latencies": {}}
+    start = time.perf_counter()
+    if workers == 1:
+        for stats in map(play_batch, batches):
+            merge(total, stats)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for stats in pool.imap(play_batch, batches):
+                merge(total, stats)
+    total["seconds"] = time.perf_counter() - start
+    return total
+
+
+def merge(total, stats):
+    """
+    Adds the stats of a batch to the running total.
+    """
+    total["games"] += stats["games"]
+    total["won"] += stats["won"]
+    total["moves"] += stats["moves"]
+    for bucket, count in stats["latencies"].items():
+        total["latencies"][bucket] = total["latencies"].get(bucket, 0) + count
+
+
+def percentile(histogram, fraction):
+    """
+    Returns the approximate latency (in seconds) below which
+    `fraction` of the samples of the histogram fall.
+    """
+    samples = sum(histogram.values())
+    if not samples:
+        return 0.0
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= fraction * samples:
+            return 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE) / 1e9
+    return 2 ** ((max(histogram) + 1) / BUCKETS_PER_OCTAVE) / 1e9
+
+
+def report(stats):
+    """
+    Summarises the merged stats of a run.
+    """
+    seconds = stats["seconds"] or 1e-9
+    histogram = stats["latencies"]
+    return {
+        "games": stats["games"],
+        "won": stats["won"],
+        "win_rate": stats["won"] / stats["games"] if stats["games"] else 0.0,
+        "moves": stats["moves"],
+        "seconds": stats["seconds"],
+        "games_per_second": stats["games"] / seconds,
+        "moves_per_second": stats["moves"] / seconds,
+        "add_knowledge": {
+            "calls": sum(histogram.values()),
+            "p50": percentile(histogram, 0.50),
+            "p90": percentile(histogram, 0.90),
+            "p99": percentile(histogram, 0.99),
+            "p999": percentile(histogram, 0.999),
+            "max": percentile(histogram, 1.0),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Minesweeper AI self-play")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=None, help="games per batch")
+    parser.add_argument("--safe-start", action="store_true",
+                        help="keep the first move and its neighbours free of mines")
+    parser.add_argument("--inference", choices=("subset", "linear"), default="subset",
+                        help="inference engine of the AI")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    stats = simulate(args.games, args.height, args.width, args.mines,
+                     args.seed, args.workers, args.chunk, args.safe_start,
+                     args.inference)
+    result = report(stats)
+    result["config"] = vars(args)
+
+    latency = result["add_knowledge"]
+    print(f"Games: {result['games']}  won: {result['won']} "
+          f"({100 * result['win_rate']:.2f}%)")
+    print(f"Time: {result['seconds']:.2f}s  "
+          f"{result['games_per_second']:.1f} games/s  "
+          f"{result['moves_per_second']:.1f} moves/s")
+    print("add_knowledge: "
+          + "  ".join(f"{k} {latency[k] * 1e6:.1f}us"
+                      for k in ("p50", "p90", "p99", "p999", "max")))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
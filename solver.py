@@ -0,0 +1,779 @@
+"""
+Mine-probability solver for the Minesweeper AI.
+
+The cells mentioned by the sentences of the knowledge base (the
+frontier) are split into independent components: two cells are in the
+same component when some chain of sentences links them. Every component
+is enumerated with backtracking, and the partial results are combined
+with the number of mines left on the board to get the exact probability
+of every frontier cell, and of any other unknown cell, being a mine.
+
+When the frontier is too big to enumerate, `sample_probabilities`
+estimates the same probabilities by sampling consistent mine layouts,
+and `sample_component` does the same for a single component, so that
+only the components that are too big have to be sampled.
+
+`linear_deductions` is the inference backend of the AI that row-reduces
+the sentences instead of comparing them in pairs, and
+`feasible_counts` applies the global mine count to the totals of the
+components for the endgame reasoning of the AI.
+"""
+import math
+import random
+import time
+from collections import OrderedDict
+
+
+# Número máximo de nodos de búsqueda por componente antes de abandonar
+MAX_NODES = 20000
+
+# Número máximo de grupos de celdas en una componente (profundidad de la búsqueda)
+MAX_GROUPS = 300
+
+# Tamaño de la caché de componentes ya resueltas, indexadas por su forma
+CACHE_SIZE = 4096
+
+# Presupuesto por defecto del muestreo aproximado (pasos de la cadena)
+SAMPLE_STEPS = 20000
+
+# Penalización por cada mina que le sobra o falta a una sentencia durante el muestreo
+VIOLATION_PENALTY = 3.0
+
+# Con un pool de procesos, tamaño mínimo (en celdas) de una componente
+# para resolverla en otro proceso, y lotes que se reparten a cada proceso.
+# Estimado en partidas expertas con un solo núcleo: enviar una forma
+# cuesta unos 100-150 us, y enumerarla aquí unos 400 us de media a partir
+# de 24 celdas (70 us con 8-11 celdas). La ganancia en paralelo no se ha
+# medido, y en tableros grandes la mayor parte del tiempo está en combine()
+PARALLEL_MIN_CELLS = 24
+CHUNKS_PER_WORKER = 4
+
+_cache = OrderedDict()
+
+
+class SolverBudgetExceeded(Exception):
+    """
+    Raised when a frontier component is too big to be enumerated
+    within the allowed number of search nodes.
+    """
+
+
+def components(sentences):
+    """
+    Splits the sentences into independent groups: sentences end up
+    in the same group when they share cells, directly or through
+    other sentences. Returns a list of lists of sentences.
+    """
+    parent = {}
+
+    def find(cell):
+        root = cell
+        while parent[root] != root:
+            root = parent[root]
+        while parent[cell] != root:
+            parent[cell], cell = root, parent[cell]
+        return root
+
+    sentences = [s for s in sentences if s.cells]
+    for sentence in sentences:
+        cells = iter(sentence.cells)
+        first = next(cells)
+        parent.setdefault(first, first)
+        root = find(first)
+        for cell in cells:
+            parent.setdefault(cell, cell)
+            other = find(cell)
+            if other != root:
+                parent[other] = root
+
+    groups = {}
+    for sentence in sentences:
+        groups.setdefault(find(next(iter(sentence.cells))), []).append(sentence)
+    return list(groups.values())
+
+
+def _canonical(sentences):
+    """
+    Returns the shape of a component (its sentences moved so that the
+    top-left corner of the component is (0, 0)) and that offset.
+    """
+    oi = min(i for s in sentences for i, _ in s.cells)
+    oj = min(j for s in sentences for _, j in s.cells)
+    shape = frozenset(
+        (frozenset((i - oi, j - oj) for i, j in s.cells), s.count)
+        for s in sentences
+    )
+    return shape, (oi, oj)
+
+
+def _enumerate(shape, max_nodes):
+    """
+    Enumerates every mine assignment of a component that satisfies all
+    its sentences.
+
+    Cells that belong to exactly the same sentences are interchangeable,
+    so they are grouped and the search only decides how many mines each
+    group holds (weighting by the number of ways to place them).
+
+    Returns a dict {k: (ways, {cell: ways with a mine in cell})} where k
+    is the number of mines in the component.
+    """
+    constraints = sorted(shape, key=lambda s: (sorted(s[0]), s[1]))
+
+    # Agrupa las celdas según el conjunto de sentencias que las contienen
+    signatures = {}
+    for n, (cells, _) in enumerate(constraints):
+        for cell in cells:
+            signatures.setdefault(cell, []).append(n)
+    by_signature = {}
+    for cell in sorted(signatures):
+        by_signature.setdefault(tuple(signatures[cell]), []).append(cell)
+    if len(by_signature) > MAX_GROUPS:
+        raise SolverBudgetExceeded(f"{len(by_signature)} cell groups")
+
+    # Ordena los grupos recorriendo las sentencias en anchura, para que
+    # cada sentencia quede completamente asignada lo antes posible
+    members = {}
+    for signature in by_signature:
+        for n in signature:
+            members.setdefault(n, []).append(signature)
+    order = []
+    seen = set()
+    pending = sorted(by_signature, key=lambda s: -len(s))
+    for start in pending:
+        if start in seen:
+            continue
+        queue = [start]
+        seen.add(start)
+        while queue:
+            signature = queue.pop(0)
+            order.append(signature)
+            for n in signature:
+                for other in members[n]:
+                    if other not in seen:
+                        seen.add(other)
+                        queue.append(other)
+
+    sizes = [len(by_signature[s]) for s in order]
+    groups = [list(s) for s in order]
+    need = [count for _, count in constraints]
+    capacity = [len(cells) for cells, _ in constraints]
+    binomials = [[math.comb(n, x) for x in range(n + 1)] for n in sizes]
+
+    results = {}
+    assigned = [0] * len(order)
+    nodes = 0
+
+    def search(pos, mines, ways):
+        nonlocal nodes
+        nodes += 1
+        if nodes > max_nodes:
+            raise SolverBudgetExceeded(f"more than {max_nodes} search nodes")
+        if pos == len(order):
+            total, per_group = results.setdefault(mines, [0, [0] * len(order)])
+            results[mines][0] = total + ways
+            for g, x in enumerate(assigned):
+                if x:
+                    per_group[g] += ways * x
+            return
+
+        size = sizes[pos]
+        low, high = 0, size
+        for n in groups[pos]:
+            # Poda: la sentencia no puede pasarse de minas ni quedarse corta
+            low = max(low, need[n] - (capacity[n] - size))
+            high = min(high, need[n])
+        if low > high:
+            return
+        for n in groups[pos]:
+            capacity[n] -= size
+        for x in range(low, high + 1):
+            for n in groups[pos]:
+                need[n] -= x
+            assigned[pos] = x
+            search(pos + 1, mines + x, ways * binomials[pos][x])
+            for n in groups[pos]:
+                need[n] += x
+        assigned[pos] = 0
+        for n in groups[pos]:
+            capacity[n] += size
+
+    search(0, 0, 1)
+
+    solutions = {}
+    for k, (total, per_group) in results.items():
+        cells = {}
+        for g, signature in enumerate(order):
+            share = per_group[g] / sizes[g]
+            for cell in by_signature[signature]:
+                cells[cell] = share
+        solutions[k] = (total, cells)
+    return solutions
+
+
+def _lookup(shape):
+    """
+    Returns the cached solutions of a shape (None if it could not be
+    solved), or raises KeyError if it is not in the cache.
+    """
+    solutions = _cache[shape]
+    _cache.move_to_end(shape)
+    return solutions
+
+
+def _store(shape, solutions):
+    _cache[shape] = solutions
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _solve_shape(args):
+    """
+    Enumerates a shape in a worker process; None if it is too big.
+    """
+    shape, max_nodes = args
+    try:
+        return _enumerate(shape, max_nodes)
+    except SolverBudgetExceeded:
+        return None
+
+
+def _place(solutions, offset):
+    """
+    Moves the solutions of a shape back to the position of its component.
+    """
+    if solutions is None:
+        raise SolverBudgetExceeded("component too big to enumerate")
+    oi, oj = offset
+    return {
+        k: (ways, {(i + oi, j + oj): w for (i, j), w in cells.items()})
+        for k, (ways, cells) in solutions.items()
+    }
+
+
+def solve_component(sentences, max_nodes=MAX_NODES):
+    """
+    Enumerates one component (see `_enumerate`), reusing the result of
+    any earlier component with the same shape.
+    """
+    shape, offset = _canonical(sentences)
+    try:
+        solutions = _lookup(shape)
+    except KeyError:
+        # También se recuerdan las formas que no se pudieron resolver
+        solutions = _solve_shape((shape, max_nodes))
+        _store(shape, solutions)
+    return _place(solutions, offset)
+
+
+def solve_components(groups, max_nodes=MAX_NODES, pool=None, workers=1,
+                     partial=False):
+    """
+    Enumerates many components, like `solve_component` on each, and
+    returns their solutions in the same order. With `partial`, the
+    components too big to enumerate are returned as None instead of
+    raising SolverBudgetExceeded.
+
+    `pool` is a multiprocessing.Pool or a
+    concurrent.futures.ProcessPoolExecutor with `workers` processes. The
+    shapes that are not cached and have at least PARALLEL_MIN_CELLS
+    cells are solved in the worker processes, in batches of about
+    CHUNKS_PER_WORKER per worker, as long as there are at least two of
+    them and `workers` is more than one; anything smaller is not worth
+    sending and is solved here. The results do not depend on where each
+    shape was solved.
+    """
+    shapes = [_canonical(group) for group in groups]
+    if pool is not None and workers > 1:
+        remote = {}
+        for (shape, _), group in zip(shapes, groups):
+            if shape in _cache or shape in remote:
+                continue
+            if len(frozenset().union(*(s.cells for s in group))) >= PARALLEL_MIN_CELLS:
+                remote[shape] = None
+        if len(remote) >= 2:
+            chunk = max(1, len(remote) // (workers * CHUNKS_PER_WORKER))
+            jobs = [(shape, max_nodes) for shape in remote]
+            for shape, solutions in zip(remote, pool.map(_solve_shape, jobs, chunksize=chunk)):
+                _store(shape, solutions)
+
+    solved = []
+    for shape, offset in shapes:
+        try:
+            solutions = _lookup(shape)
+        except KeyError:
+            solutions = _solve_shape((shape, max_nodes))
+            _store(shape, solutions)
+        if solutions is None and partial:
+            solved.append(None)
+        else:
+            solved.append(_place(solutions, offset))
+    return solved
+
+
+def _convolve(a, b):
+    result = {}
+    for ka, wa in a.items():
+        for kb, wb in b.items():
+            result[ka + kb] = result.get(ka + kb, 0.0) + wa * wb
+    return result
+
+
+def _log_binomial(n, k):
+    return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+
+
+def combine(solved, unknown, mines_left):
+    """
+    Combines the enumerated components with the global mine count.
+
+    `solved` is a list of component results (see `solve_component`),
+    `unknown` the number of cells not known to be safe or mines and
+    `mines_left` the number of mines not found yet.
+
+    Returns (probabilities, interior) where `probabilities` maps every
+    frontier cell to its chance of being a mine and `interior` is the
+    chance for any unknown cell outside the frontier (None if there are
+    no such cells).
+    """
+    frontier = sum(len(next(iter(s.values()))[1]) for s in solved if s)
+    interior = unknown - frontier
+
+    # Cada componente se normaliza por su mayor peso para evitar desbordes
+    polys = []
+    for solutions in solved:
+        top = max(ways for ways, _ in solutions.values())
+        polys.append({k: ways / top for k, (ways, _) in solutions.items()})
+
+    def interior_weights(use_count):
+        if not use_count:
+            return lambda k: 1.0
+        logs = {}
+        for k in range(max(0, mines_left - interior), mines_left + 1):
+            logs[k] = _log_binomial(interior, mines_left - k)
+        if not logs:
+            return lambda k: 0.0
+        top = max(logs.values())
+        weights = {k: math.exp(v - top) for k, v in logs.items()}
+        return lambda k: weights.get(k, 0.0)
+
+    prefix = [{0: 1.0}]
+    for poly in polys:
+        prefix.append(_convolve(prefix[-1], poly))
+    suffix = [{0: 1.0}]
+    for poly in reversed(polys):
+        suffix.append(_convolve(suffix[-1], poly))
+    suffix.reverse()
+
+    everything = prefix[-1]
+    weight = interior_weights(True)
+    total = sum(w * weight(k) for k, w in everything.items())
+    if total <= 0:
+        # El conteo global no encaja con las sentencias: se ignora
+        weight = interior_weights(False)
+        total = sum(everything.values())
+
+    probabilities = {}
+    for n, solutions in enumerate(solved):
+        others = _convolve(prefix[n], suffix[n + 1])
+        top = max(ways for ways, _ in solutions.values())
+        for k, (ways, cells) in solutions.items():
+            factor = sum(w * weight(k + j) for j, w in others.items()) / top
+            if not factor:
+                continue
+            for cell, mine_ways in cells.items():
+                probabilities[cell] = probabilities.get(cell, 0.0) + mine_ways * factor
+        for cell in next(iter(solutions.values()))[1]:
+            probabilities[cell] = probabilities.get(cell, 0.0) / total
+
+    if interior <= 0:
+        return probabilities, None
+    expected = sum(w * weight(k) * (mines_left - k) for k, w in everything.items())
+    return probabilities, min(1.0, max(0.0, expected / total / interior))
+
+
+def mine_probabilities(sentences, unknown, mines_left, max_nodes=MAX_NODES,
+                       pool=None, workers=1, sample=False, steps=SAMPLE_STEPS,
+                       time_limit=None, rng=None):
+    """
+    Returns the exact mine probabilities implied by `sentences`, see
+    `combine`. Raises SolverBudgetExceeded if a component is too big,
+    unless `sample` is set: then only the components that are too big
+    are estimated with `sample_component` (sharing `steps` each and
+    `time_limit` between them) and combined with the exact ones. The
+    components can be solved on a process `pool` of `workers`
+    processes (see `solve_components`).
+    """
+    groups = components(sentences)
+    solved = solve_components(groups, max_nodes, pool, workers, partial=sample)
+    failed = [n for n, solutions in enumerate(solved) if solutions is None]
+    for n in failed:
+        solved[n] = sample_component(
+            groups[n], steps,
+            None if time_limit is None else time_limit / len(failed), rng
+        )
+    return combine([s for s in solved if s], unknown, mines_left)
+
+
+def _chain_start(sentences, rng):
+    """
+    Indexes the cells of the sentences for the sampling chains and
+    draws a first layout, placing mines sentence by sentence. Returns
+    (cells, members, counts, of_cell, state, sums), where `members`
+    holds the cell positions of each sentence, `of_cell` the sentences
+    of each cell and `sums` the mines of each sentence in `state`.
+    """
+    cells = sorted({cell for s in sentences for cell in s.cells})
+    position = {cell: n for n, cell in enumerate(cells)}
+    members = [[position[c] for c in s.cells] for s in sentences]
+    counts = [s.count for s in sentences]
+    of_cell = [[] for _ in cells]
+    for n, sentence_cells in enumerate(members):
+        for c in sentence_cells:
+            of_cell[c].append(n)
+
+    # Estado inicial: se reparten minas al azar sentencia por sentencia
+    state = [0] * len(cells)
+    order = list(range(len(sentences)))
+    rng.shuffle(order)
+    for n in order:
+        need = counts[n] - sum(state[c] for c in members[n])
+        free = [c for c in members[n] if not state[c]]
+        rng.shuffle(free)
+        for c in free[:max(need, 0)]:
+            state[c] = 1
+    sums = [sum(state[c] for c in members[n]) for n in range(len(sentences))]
+    return cells, members, counts, of_cell, state, sums
+
+
+def _propose(state, members, of_cell, rng):
+    """
+    Draws a move of the sampling chains as a list of (cell, change):
+    a flip of one cell, or a swap of a mine with a free cell of one of
+    its sentences (empty if the two cells drawn are alike).
+    """
+    a = rng.randrange(len(state))
+    if rng.random() < 0.5:
+        return [(a, 1 - 2 * state[a])]
+    group = members[rng.choice(of_cell[a])]
+    b = group[rng.randrange(len(group))]
+    # Solo se intercambia una mina con una celda libre
+    if state[b] == state[a]:
+        return []
+    return [(a, 1 - 2 * state[a]), (b, 1 - 2 * state[b])]
+
+
+def _energy_change(changes, sums, counts, of_cell):
+    """
+    Change in the number of missing or extra mines of the sentences
+    after a move, and the change in mines of every touched sentence.
+    """
+    delta = 0
+    touched = {}
+    for c, d in changes:
+        for n in of_cell[c]:
+            touched[n] = touched.get(n, 0) + d
+    for n, d in touched.items():
+        delta += abs(sums[n] + d - counts[n]) - abs(sums[n] - counts[n])
+    return delta, touched
+
+
+def sample_component(sentences, steps=SAMPLE_STEPS, time_limit=None, rng=None):
+    """
+    Estimates the solutions of one component, in the form returned by
+    `_enumerate` ({k: (ways, {cell: ways with a mine in cell})}), for
+    components too big to be enumerated. The ways are relative
+    frequencies rather than counts, which `combine` accepts as they
+    are.
+
+    It runs the chain of `sample_probabilities` without the weight of
+    the mines left outside the component, so that every layout that
+    satisfies the sentences is equally likely, and reads the layout
+    every few steps.
+    """
+    rng = rng or random
+    sentences = [s for s in sentences if s.cells]
+    cells, members, counts, of_cell, state, sums = _chain_start(sentences, rng)
+    energy = sum(abs(sums[n] - counts[n]) for n in range(len(sentences)))
+    burn_in = steps // 5
+    # Leer el estado cuesta una pasada por todas las celdas: se lee cada
+    # `thin` pasos para que el coste por paso no crezca con la componente
+    thin = max(1, len(cells) // 8)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    ways = {}
+    mined = {}
+    for step in range(steps):
+        if deadline is not None and not step % 1024 and time.perf_counter() > deadline:
+            break
+        changes = _propose(state, members, of_cell, rng)
+        if changes:
+            delta, touched = _energy_change(changes, sums, counts, of_cell)
+            if delta <= 0 or rng.random() < math.exp(-VIOLATION_PENALTY * delta):
+                for c, d in changes:
+                    state[c] += d
+                for n, d in touched.items():
+                    sums[n] += d
+                energy += delta
+        if step >= burn_in and energy == 0 and not step % thin:
+            k = sum(state)
+            ways[k] = ways.get(k, 0) + 1
+            per_cell = mined.setdefault(k, [0] * len(cells))
+            for c, value in enumerate(state):
+                per_cell[c] += value
+
+    if not ways:
+        # Ningún estado válido: se estima con la densidad de cada sentencia
+        density = {
+            cell: max(counts[n] / len(members[n]) for n in of_cell[c])
+            for c, cell in enumerate(cells)
+        }
+        return {round(sum(density.values())): (1.0, density)}
+    return {
+        k: (total, dict(zip(cells, mined[k])))
+        for k, total in ways.items()
+    }
+
+
+def sample_probabilities(sentences, unknown, mines_left, steps=SAMPLE_STEPS,
+                         time_limit=None, rng=None):
+    """
+    Estimates the same probabilities as `mine_probabilities` by sampling
+    mine layouts that satisfy `sentences`, for frontiers too big to be
+    enumerated. The cost grows linearly with `steps` (and stops early
+    after `time_limit` seconds); more steps give better estimates.
+
+    The sampler is a Metropolis chain over the frontier cells. A move
+    either flips one cell or swaps a mine with a free cell of one of its
+    sentences. Layouts that break a sentence are allowed but penalised,
+    so the chain can move between distant solutions, and only the
+    layouts that satisfy every sentence are counted. Each layout is
+    weighted by the number of ways to place the remaining mines outside
+    the frontier.
+    """
+    rng = rng or random
+    sentences = [s for s in sentences if s.cells]
+    cells, members, counts, of_cell, state, sums = _chain_start(sentences, rng)
+    interior = unknown - len(cells)
+    if not cells:
+        return {}, (min(1.0, max(0.0, mines_left / interior)) if interior > 0 else None)
+
+    # Peso (logarítmico) de tener k minas en la frontera
+    log_weight = []
+    for k in range(len(cells) + 1):
+        m = mines_left - k
+        if 0 <= m <= max(interior, 0):
+            log_weight.append(_log_binomial(max(interior, 0), m))
+        else:
+            log_weight.append(None)
+
+    energy = sum(abs(sums[n] - counts[n]) for n in range(len(sentences)))
+    mines = sum(state)
+
+    def weight(k):
+        # Los conteos imposibles se penalizan en vez de prohibirse
+        w = log_weight[k]
+        if w is None:
+            return -VIOLATION_PENALTY * (1 + abs(mines_left - k))
+        return w
+
+    valid = 0
+    mine_time = [0] * len(cells)
+    since = [0] * len(cells)
+    interior_mines = 0.0
+    burn_in = steps // 5
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    for step in range(steps):
+        if deadline is not None and not step % 1024 and time.perf_counter() > deadline:
+            break
+
+        changes = _propose(state, members, of_cell, rng)
+        if changes:
+            delta, touched = _energy_change(changes, sums, counts, of_cell)
+            new_mines = mines + sum(d for _, d in changes)
+            log_ratio = (weight(new_mines) - weight(mines)
+                         - VIOLATION_PENALTY * delta)
+            if log_ratio >= 0 or rng.random() < math.exp(log_ratio):
+                for c, d in changes:
+                    if step >= burn_in:
+                        # Se acumula el tiempo que la celda estuvo minada
+                        if d < 0:
+                            mine_time[c] += valid - since[c]
+                        else:
+                            since[c] = valid
+                    state[c] += d
+                for n, d in touched.items():
+                    sums[n] += d
+                energy += delta
+                mines = new_mines
+
+        if step == burn_in:
+            since = [valid] * len(cells)
+        if step >= burn_in and energy == 0 and log_weight[mines] is not None:
+            valid += 1
+            if interior > 0:
+                interior_mines += (mines_left - mines) / interior
+
+    if not valid:
+        # Ningún estado válido: se estima con la densidad de cada sentencia
+        probabilities = {
+            cell: max(counts[n] / len(members[n]) for n in of_cell[c])
+            for c, cell in enumerate(cells)
+        }
+        if interior <= 0:
+            return probabilities, None
+        rest = mines_left - sum(probabilities.values())
+        return probabilities, min(1.0, max(0.0, rest / interior))
+
+    probabilities = {}
+    for c, cell in enumerate(cells):
+        if state[c]:
+            mine_time[c] += valid - since[c]
+        probabilities[cell] = mine_time[c] / valid
+    if interior <= 0:
+        return probabilities, None
+    return probabilities, interior_mines / valid
+
+
+def _reduce(row, pivot):
+    """
+    Eliminates the pivot cell of `pivot` from `row`, both given as
+    (bit, positive, negative, count). Rows are left as they are when
+    the step would give some cell a coefficient of 2 or -2.
+    """
+    bit, positive, negative, count = row
+    pivot_bit, pivot_positive, pivot_negative, pivot_count = pivot
+    pivot_cells = pivot_positive | pivot_negative
+    row_cells = positive | negative
+    if positive & pivot_bit:
+        # row - pivot
+        if positive & pivot_negative or negative & pivot_positive:
+            return row
+        return (bit,
+                positive & ~pivot_cells | pivot_negative & ~row_cells,
+                negative & ~pivot_cells | pivot_positive & ~row_cells,
+                count - pivot_count)
+    if negative & pivot_bit:
+        # row + pivot
+        if positive & pivot_positive or negative & pivot_negative:
+            return row
+        return (bit,
+                positive & ~pivot_cells | pivot_positive & ~row_cells,
+                negative & ~pivot_cells | pivot_negative & ~row_cells,
+                count + pivot_count)
+    return row
+
+
+def _forced(positive, negative, count):
+    """
+    Returns the (mines, safes) bitmasks forced by a row, or None when
+    its count is neither the lowest nor the highest value it can take.
+    """
+    if count == positive.bit_count():
+        return positive, negative
+    if count == -negative.bit_count():
+        return negative, positive
+    return None
+
+
+def linear_deductions(sentences):
+    """
+    Returns the cells that the sentences force to be safe or mines when
+    taken all together, as a pair of sets (safes, mines).
+
+    The sentences are the rows of a 0/1 matrix, one bit per cell, and
+    are row-reduced by Gauss-Jordan elimination. A reduced row is kept
+    as two bitmasks (cells with coefficient 1 and -1) and a count, and
+    forces all its cells when the count is the lowest or the highest
+    value the row can take. Since `_reduce` skips the steps that would
+    give a coefficient of 2, every row is checked in this way as it is
+    read, after each step and at the end, and not only once reduced.
+    """
+    cells = []
+    bits = {}
+    pivots = []
+    forced_mines = forced_safes = 0
+
+    def check(positive, negative, count):
+        nonlocal forced_mines, forced_safes
+        forced = _forced(positive, negative, count)
+        if forced is not None:
+            forced_mines |= forced[0]
+            forced_safes |= forced[1]
+
+    for sentence in sentences:
+        positive = 0
+        for cell in sentence.cells:
+            bit = bits.get(cell)
+            if bit is None:
+                bit = bits[cell] = 1 << len(cells)
+                cells.append(cell)
+            positive |= bit
+        check(positive, 0, sentence.count)
+        row = (0, positive, 0, sentence.count)
+        for pivot in pivots:
+            reduced = _reduce(row, pivot)
+            if reduced is not row:
+                row = reduced
+                check(*row[1:])
+        _, positive, negative, count = row
+        both = positive | negative
+        if not both:
+            continue
+        # Nuevo pivote: la celda más baja de la fila, con coeficiente 1
+        bit = both & -both
+        if negative & bit:
+            positive, negative, count = negative, positive, -count
+        row = (bit, positive, negative, count)
+        updated = []
+        for pivot in pivots:
+            reduced = _reduce(pivot, row)
+            if reduced is not pivot:
+                check(*reduced[1:])
+            updated.append(reduced)
+        pivots = updated
+        pivots.append(row)
+
+    for _, positive, negative, count in pivots:
+        check(positive, negative, count)
+
+    safes = set()
+    mines = set()
+    for mask, found in ((forced_mines, mines), (forced_safes, safes)):
+        while mask:
+            low = mask & -mask
+            found.add(cells[low.bit_length() - 1])
+            mask ^= low
+    return safes, mines
+
+
+def feasible_counts(counts, interior, mines_left):
+    """
+    Applies the global mine count to the possible mine totals of the
+    frontier components. `counts` holds one set of possible totals per
+    component, `interior` is the number of unknown cells outside every
+    component and `mines_left` the number of mines not found yet.
+
+    Returns (feasible, interior_mines): for every component, the totals
+    that some layout of the whole board can still reach, and the set of
+    possible numbers of mines among the interior cells.
+    """
+    def fits(total):
+        return 0 <= mines_left - total <= interior
+
+    # Sumas alcanzables por las componentes anteriores y posteriores
+    prefix = [{0}]
+    for possible in counts:
+        prefix.append({a + b for a in prefix[-1] for b in possible})
+    suffix = [{0}]
+    for possible in reversed(counts):
+        suffix.append({a + b for a in suffix[-1] for b in possible})
+    suffix.reverse()
+
+    feasible = []
+    for n, possible in enumerate(counts):
+        others = {a + b for a in prefix[n] for b in suffix[n + 1]}
+        feasible.append({k for k in possible if any(fits(k + t) for t in others)})
+    interior_mines = {mines_left - total for total in prefix[-1] if fits(total)}
+    return feasible, interior_mines
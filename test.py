@@ -138,8 +138,6 @@ class Sentence:
         """
         # raise NotImplementedError
         if self.count == 0:
-            if len(self.cells) != 0:
-                print(f"{self} => SAFE: {self.cells}")
             return self.cells
         else:
             return set()
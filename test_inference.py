@@ -0,0 +1,428 @@
+"""
+Checks of the AI's reasoning against brute force on small boards:
+
+    python -m unittest test_inference
+"""
+import itertools
+import random
+import unittest
+
+import solver
+from minesweeper import (BitboardMinesweeper, InvalidMove, Minesweeper, MinesweeperAI,
+                         Sentence, Session, neighbours, place_mines)
+
+
+def brute_force_probabilities(sentences, unknown, mines_left):
+    """
+    Mine probability of every unknown cell, counting every layout of
+    `mines_left` mines on the `unknown` cells that agrees with the
+    sentences.
+    """
+    layouts = 0
+    mines = dict.fromkeys(unknown, 0)
+    for chosen in itertools.combinations(unknown, mines_left):
+        chosen = set(chosen)
+        if all(len(s.cells & chosen) == s.count for s in sentences):
+            layouts += 1
+            for cell in chosen:
+                mines[cell] += 1
+    return {cell: n / layouts for cell, n in mines.items()}
+
+
+def brute_force_forced(sentences, cells):
+    """
+    Cells that are safe, and cells that are mines, in every assignment
+    of the cells that agrees with the sentences (None if there is none).
+    """
+    safes, mines = set(cells), set(cells)
+    found = False
+    for values in itertools.product((0, 1), repeat=len(cells)):
+        layout = dict(zip(cells, values))
+        if all(sum(layout[c] for c in s.cells) == s.count for s in sentences):
+            found = True
+            safes -= {c for c in cells if layout[c]}
+            mines -= {c for c in cells if not layout[c]}
+    return (safes, mines) if found else None
+
+
+class ProbabilityTest(unittest.TestCase):
+
+    def test_exact_solver_matches_brute_force(self):
+        rng = random.Random(3)
+        for seed in range(300):
+            height, width = rng.randint(2, 4), rng.randint(2, 4)
+            total = rng.randint(1, height * width // 2)
+            game = Minesweeper(height, width, total, seed=seed)
+            ai = MinesweeperAI(height, width, total)
+            free = [(i, j) for i in range(height) for j in range(width)
+                    if not game.is_mine((i, j))]
+            for cell in rng.sample(free, rng.randint(1, len(free))):
+                ai.add_knowledge(cell, game.nearby_mines(cell))
+            unknown = [(i, j) for i in range(height) for j in range(width)
+                       if (i, j) not in ai.safes and (i, j) not in ai.mines]
+            if not unknown:
+                continue
+            mines_left = total - len(ai.mines)
+
+            probabilities, interior = solver.mine_probabilities(
+                ai.knowledge, len(unknown), mines_left
+            )
+            expected = brute_force_probabilities(ai.knowledge, unknown, mines_left)
+            for cell in unknown:
+                if cell in probabilities:
+                    self.assertAlmostEqual(probabilities[cell], expected[cell], places=9)
+                else:
+                    self.assertAlmostEqual(interior, expected[cell], places=9)
+
+    def test_only_the_big_components_are_sampled(self):
+        # Con un presupuesto de 2 nodos la sentencia suelta se enumera y la
+        # fila se muestrea; el resultado combinado se acerca al exacto
+        rng = random.Random(4)
+        row = [(2, j) for j in range(12)]
+        hidden = {cell: rng.random() < 0.35 for cell in row}
+        sentences = [Sentence([(0, 0), (0, 1)], 1)] + [
+            Sentence(row[j:j + 3], sum(hidden[c] for c in row[j:j + 3]))
+            for j in range(0, 11, 2)
+        ]
+        unknown = [(0, 0), (0, 1)] + row + [(5, j) for j in range(4)]
+        mines_left = sum(hidden.values()) + 2
+
+        solver._cache.clear()
+        self.addCleanup(solver._cache.clear)
+        with self.assertRaises(solver.SolverBudgetExceeded):
+            solver.mine_probabilities(sentences, len(unknown), mines_left, max_nodes=2)
+        sampled = []
+        sample_component = solver.sample_component
+
+        def record(group, *args):
+            sampled.append(group)
+            return sample_component(group, *args)
+
+        solver.sample_component = record
+        self.addCleanup(setattr, solver, "sample_component", sample_component)
+        probabilities, interior = solver.mine_probabilities(
+            sentences, len(unknown), mines_left, max_nodes=2, sample=True,
+            steps=200000, rng=random.Random(1)
+        )
+        self.assertEqual([set(group) for group in sampled], [set(sentences[1:])])
+        expected = brute_force_probabilities(sentences, unknown, mines_left)
+        for cell in unknown:
+            self.assertAlmostEqual(probabilities.get(cell, interior), expected[cell], delta=0.05)
+
+
+class LinearDeductionTest(unittest.TestCase):
+
+    def test_deductions_are_forced(self):
+        rng = random.Random(17)
+        deduced = 0
+        for _ in range(3000):
+            cells = [(0, k) for k in range(rng.randint(2, 8))]
+            hidden = {cell: rng.random() < 0.4 for cell in cells}
+            sentences = []
+            for _ in range(rng.randint(1, 5)):
+                chosen = rng.sample(cells, rng.randint(1, min(4, len(cells))))
+                sentences.append(Sentence(chosen, sum(hidden[c] for c in chosen)))
+
+            safes, mines = solver.linear_deductions(sentences)
+            forced_safes, forced_mines = brute_force_forced(sentences, cells)
+            self.assertLessEqual(safes, forced_safes)
+            self.assertLessEqual(mines, forced_mines)
+            deduced += bool(safes or mines)
+        self.assertGreater(deduced, 0)
+
+    def test_finds_what_the_subset_rule_misses(self):
+        # Ninguna sentencia contiene a otra, pero juntas fuerzan dos minas
+        sentences = [
+            Sentence([(0, 2), (0, 3), (0, 4)], 1),
+            Sentence([(0, 0), (0, 2), (0, 3)], 2),
+            Sentence([(0, 1), (0, 4)], 1),
+        ]
+        safes, mines = solver.linear_deductions(sentences)
+        self.assertEqual(mines, {(0, 0), (0, 1)})
+        self.assertLessEqual(safes, {(0, 4)})
+
+    def test_linear_engine_finds_what_subset_finds(self):
+        # Con las mismas celdas descubiertas, inference="linear" sabe al
+        # menos todo lo que sabe la regla del subconjunto
+        rng = random.Random(11)
+        boards = [(16, 30, 99)] * 20 + [(rng.randint(4, 9), rng.randint(4, 9), 0)
+                                         for _ in range(200)]
+        for seed, (height, width, mines) in enumerate(boards):
+            mines = mines or rng.randint(2, height * width // 4)
+            random.seed(seed)
+            start = (height // 2, width // 2)
+            game = Minesweeper(height, width, mines, seed=seed, safe=start)
+            subset = MinesweeperAI(height, width, mines)
+            linear = MinesweeperAI(height, width, mines, inference="linear")
+            move = start
+            while move is not None and not game.is_mine(move):
+                revealed = game.reveal(move)
+                subset.add_knowledge_batch(revealed)
+                linear.add_knowledge_batch(revealed)
+                self.assertLessEqual(set(subset.safes), set(linear.safes))
+                self.assertLessEqual(set(subset.mines), set(linear.mines))
+                move = subset.make_safe_move() or subset.make_guess_move()
+
+
+class EndgameTest(unittest.TestCase):
+
+    def test_marks_are_forced_by_the_mine_count(self):
+        # Todo lo que el AI sabe debe cumplirse en cada disposición de las
+        # minas que respeta lo descubierto y el número total de minas
+        rng = random.Random(18)
+        for seed in range(150):
+            height, width = rng.randint(2, 4), rng.randint(3, 5)
+            total = rng.randint(1, 4)
+            game = Minesweeper(height, width, total, seed=seed)
+            ai = MinesweeperAI(height, width, total)
+            cells = [(i, j) for i in range(height) for j in range(width)]
+            observed = {}
+            free = [cell for cell in cells if not game.is_mine(cell)]
+            for cell in rng.sample(free, rng.randint(1, len(free))):
+                observed[cell] = game.nearby_mines(cell)
+                ai.add_knowledge(cell, observed[cell])
+
+                hidden = [cell for cell in cells if cell not in observed]
+                layouts = []
+                for chosen in itertools.combinations(hidden, total):
+                    chosen = set(chosen)
+                    if all(sum(n in chosen for n in ai.neighbours(c)) == count
+                           for c, count in observed.items()):
+                        layouts.append(chosen)
+                for layout in layouts:
+                    self.assertTrue(layout.isdisjoint(ai.safes))
+                    self.assertLessEqual(set(ai.mines), layout)
+
+    def test_interior_count(self):
+        # La frontera tiene exactamente 1 mina, la única: el interior es seguro
+        ai = MinesweeperAI(2, 4, 1)
+        ai.add_knowledge((0, 0), 1)
+        self.assertLessEqual({(0, 2), (0, 3), (1, 2), (1, 3)}, set(ai.safes))
+
+        ai = MinesweeperAI(2, 4, 1)
+        ai.endgame_cells = 0
+        ai.add_knowledge((0, 0), 1)
+        self.assertNotIn((1, 3), ai.safes)
+
+    def test_single_feasible_total(self):
+        # {a, b} = 1 y {b, c} = 1 admiten 1 o 2 minas; con 2 minas en el
+        # tablero solo cabe a = c = mina, b = segura
+        ai = MinesweeperAI(1, 5, 2)
+        ai.add_knowledge((0, 1), 1)
+        ai.add_knowledge((0, 3), 1)
+        self.assertEqual(set(ai.mines), {(0, 0), (0, 4)})
+        self.assertIn((0, 2), ai.safes)
+
+        ai = MinesweeperAI(1, 5, 2)
+        ai.endgame_cells = 0
+        ai.add_knowledge((0, 1), 1)
+        ai.add_knowledge((0, 3), 1)
+        self.assertNotIn((0, 2), ai.safes)
+
+
+class CheckedAI(MinesweeperAI):
+    """
+    AI that compacts after every update and checks that eviction keeps
+    every observed sentence.
+    """
+
+    def _evict(self):
+        observed = set(self.knowledge) - set(self._derived)
+        super()._evict()
+        assert observed <= self.knowledge, "an observed sentence was evicted"
+
+    def add_knowledge_batch(self, counts):
+        super().add_knowledge_batch(counts)
+        self.compact()
+
+
+class KnowledgeCapTest(unittest.TestCase):
+
+    def test_no_deduction_is_lost(self):
+        # Con las mismas celdas descubiertas, compactar y desalojar
+        # sentencias deducidas no cambia las celdas seguras ni las minas
+        rng = random.Random(15)
+        boards = [(16, 30, 99)] * 6 + [(rng.randint(5, 12), rng.randint(5, 12), 0)
+                                        for _ in range(40)]
+        for inference in ("subset", "linear"):
+            for seed, (height, width, mines) in enumerate(boards):
+                mines = mines or rng.randint(3, height * width // 5)
+                random.seed(seed)
+                start = (height // 2, width // 2)
+                game = Minesweeper(height, width, mines, seed=seed, safe=start)
+                reference = MinesweeperAI(height, width, mines, inference=inference)
+                capped = [CheckedAI(height, width, mines, inference=inference,
+                                    max_knowledge=cap) for cap in (None, 0, 5)]
+                move = start
+                while move is not None and not game.is_mine(move):
+                    revealed = game.reveal(move)
+                    reference.add_knowledge_batch(revealed)
+                    for ai in capped:
+                        ai.add_knowledge_batch(revealed)
+                        self.assertEqual(set(ai.safes), set(reference.safes))
+                        self.assertEqual(set(ai.mines), set(reference.mines))
+                        if ai.max_knowledge is not None:
+                            self.assertFalse(ai._derived and len(ai.knowledge) > ai.max_knowledge)
+                    move = reference.make_safe_move() or reference.make_guess_move()
+
+
+def ai_state(ai):
+    """
+    Everything `restore` has to put back (derived sentences as a set:
+    their age is not restored).
+    """
+    return (
+        set(ai.knowledge),
+        {cell: set(sentences) for cell, sentences in ai.index.items()},
+        bytes(ai.cells.state),
+        (len(ai.safes), len(ai.mines), len(ai.moves_made)),
+        list(ai._pool), list(ai._pool_slot),
+        sorted(ai._safe_queue), set(ai._derived),
+    )
+
+
+class UndoTest(unittest.TestCase):
+
+    def test_branch_restores_the_state(self):
+        for safe_order in ("fifo", "information"):
+            for seed in range(20):
+                random.seed(seed)
+                game = Minesweeper(16, 30, 99, seed=seed, safe=(8, 15))
+                ai = MinesweeperAI(16, 30, 99, safe_order=safe_order)
+                move = (8, 15)
+                while move is not None and not game.is_mine(move):
+                    revealed = game.reveal(move)
+                    before = ai_state(ai)
+                    with ai.branch():
+                        ai.add_knowledge_batch(revealed)
+                        ai.make_safe_move()
+                    self.assertEqual(ai_state(ai), before)
+                    self.assertIsNone(ai._trail)
+                    ai.add_knowledge_batch(revealed)
+                    move = ai.make_safe_move() or ai.make_guess_move()
+
+    def test_nested_checkpoints(self):
+        ai = MinesweeperAI(8, 8, 8)
+        outer = ai.checkpoint()
+        ai.add_knowledge((0, 0), 1)
+        middle = ai_state(ai)
+        inner = ai.checkpoint()
+        ai.add_knowledge((7, 7), 0)
+        ai.restore(inner)
+        self.assertEqual(ai_state(ai), middle)
+        ai.release(inner)
+        self.assertIsNotNone(ai._trail)
+        ai.restore(outer)
+        self.assertEqual(ai.knowledge, set())
+        ai.release(outer)
+        self.assertIsNone(ai._trail)
+
+    def test_released_tokens_are_rejected(self):
+        ai = MinesweeperAI(8, 8, 8)
+        with ai.branch():
+            token = ai.checkpoint()
+        with self.assertRaises(ValueError):
+            ai.restore(token)
+        with self.assertRaises(ValueError):
+            ai.release(MinesweeperAI(8, 8, 8).checkpoint())
+
+
+class BoardTest(unittest.TestCase):
+
+    def test_place_mines(self):
+        rng = random.Random(10)
+        for _ in range(500):
+            height, width = rng.randint(1, 9), rng.randint(1, 9)
+            cells = height * width
+            safe = (rng.randrange(height), rng.randrange(width))
+            mines = rng.randint(0, cells - 1)
+            chosen = place_mines(height, width, mines, random.Random(rng.random()), safe)
+            self.assertEqual(len(set(chosen)), mines)
+            self.assertTrue(all(0 <= index < cells for index in chosen))
+            placed = {divmod(index, width) for index in chosen}
+            clear = {safe, *neighbours(safe, height, width)}
+            if mines <= cells - len(clear):
+                # El primer clic y sus vecinos quedan libres
+                self.assertTrue(placed.isdisjoint(clear))
+            else:
+                # Tablero demasiado lleno: solo queda libre la celda
+                self.assertNotIn(safe, placed)
+                self.assertFalse(placed.isdisjoint(clear))
+
+    def test_place_mines_out_of_range(self):
+        with self.assertRaises(ValueError):
+            place_mines(3, 3, -1)
+        with self.assertRaises(ValueError):
+            place_mines(3, 3, 10)
+        with self.assertRaises(ValueError):
+            place_mines(3, 3, 9, safe=(1, 1))
+        self.assertEqual(sorted(place_mines(3, 3, 9)), list(range(9)))
+        self.assertEqual(sorted(place_mines(3, 3, 8, safe=(1, 1))),
+                         [0, 1, 2, 3, 5, 6, 7, 8])
+
+    def test_bitboard_matches_minesweeper(self):
+        rng = random.Random(7)
+        for seed in range(100):
+            height, width = rng.randint(1, 12), rng.randint(1, 12)
+            total = rng.randint(0, height * width - 1)
+            safe = (rng.randrange(height), rng.randrange(width))
+            game = Minesweeper(height, width, total, seed=seed, safe=safe)
+            bitboard = BitboardMinesweeper(height, width, total, seed=seed, safe=safe)
+            self.assertEqual(bitboard.mines, game.mines)
+            cells = list(itertools.product(range(height), range(width)))
+            self.assertEqual(bitboard.nearby_mines_many(cells),
+                             game.nearby_mines_many(cells))
+            rng.shuffle(cells)
+            for cell in cells:
+                if not game.is_mine(cell):
+                    self.assertEqual(bitboard.reveal(cell), game.reveal(cell))
+                    self.assertEqual(bitboard.is_revealed(cell), game.is_revealed(cell))
+
+            # Se gana marcando exactamente las minas, también al desmarcar
+            # una marca errónea
+            for board in (game, bitboard):
+                if len(game.mines) < height * width:
+                    wrong = next(c for c in cells if not game.is_mine(c))
+                    board.flag(wrong)
+                for cell in game.mines:
+                    board.flag(cell)
+                self.assertEqual(board.won(), len(game.mines) == height * width)
+                if len(game.mines) < height * width:
+                    board.flag(wrong)
+                    self.assertFalse(board.is_flagged(wrong))
+                self.assertTrue(board.won())
+                self.assertEqual(set(board.mines_found), game.mines)
+
+
+class SessionTest(unittest.TestCase):
+
+    def test_rules(self):
+        # Se gana descubriendo todas las celdas seguras o marcando
+        # exactamente las minas; tras ganar o perder no se juega más
+        session = Session(4, 4, 2, seed=5)
+        session.reveal((0, 0))
+        self.assertFalse(session.game.is_mine((0, 0)))
+        for cell in itertools.product(range(4), repeat=2):
+            if session.state() == "playing" and not session.game.is_mine(cell):
+                session.reveal(cell)
+        self.assertEqual(session.state(), "won")
+        self.assertEqual(session.flags, set())
+
+        session = Session(4, 4, 2, seed=5)
+        revealed = session.reveal((0, 0))
+        with self.assertRaises(InvalidMove):
+            session.flag(next(iter(revealed)))
+        for cell in session.game.mines:
+            self.assertTrue(session.flag(cell))
+        self.assertEqual(session.state(), "won")
+        with self.assertRaises(InvalidMove):
+            session.reveal((3, 3))
+
+        session = Session(4, 4, 2, seed=5)
+        session.reveal((0, 0))
+        self.assertEqual(session.reveal(next(iter(session.game.mines))), {})
+        self.assertEqual(session.state(), "lost")
+
+
+if __name__ == "__main__":
+    unittest.main()